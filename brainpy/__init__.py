@@ -30,7 +30,6 @@ from brainpy import (
   measure,  # methods for data analysis
   inputs,  # methods for generating input currents
   encoding,  # encoding schema
-  checkpoints,  # checkpoints
   check,  # error checking
   mixin,  # mixin classes
   algorithms,  # online or offline training algorithms
@@ -106,14 +105,16 @@ from brainpy._src.train.offline import (OfflineTrainer as OfflineTrainer,
                                         RidgeTrainer as RidgeTrainer, )
 
 
-#  Part: Analysis  #
-# ---------------- #
-from brainpy import (analysis as analysis)
-
-
-#  Part: Others    #
-# ---------------- #
-from brainpy._src.visualization import (visualize as visualize)
+#  Part: Analysis & Others  #
+# ------------------------- #
+# "brainpy.analysis", "brainpy.checkpoints" and "brainpy.visualize" pull in
+# heavy dependencies (matplotlib, msgpack, ...), so they are lazily
+# imported on their first access (see ``__getattr__`` below).
+__lazy_attrs = {
+  'analysis': ('brainpy.analysis', None),
+  'checkpoints': ('brainpy.checkpoints', None),  # checkpoints
+  'visualize': ('brainpy._src.visualization', 'visualize'),
+}
 
 
 #  Part: Deprecations  #
@@ -149,7 +150,27 @@ __deprecations = {
   'TwoEndConn': ('brainpy.TwoEndConn', 'brainpy.synapses.TwoEndConn', synapses.TwoEndConn),
   'CondNeuGroup': ('brainpy.CondNeuGroup', 'brainpy.dyn.CondNeuGroup', dyn.CondNeuGroup),
 }
-__getattr__ = deprecation_getattr2('brainpy', __deprecations)
+__deprecation_getattr = deprecation_getattr2('brainpy', __deprecations)
+
+
+def __getattr__(name):
+  if name in __lazy_attrs:
+    import importlib
+    module, attr = __lazy_attrs[name]
+    value = importlib.import_module(module)
+    if attr is not None:
+      value = getattr(value, attr)
+    globals()[name] = value
+    return value
+  return __deprecation_getattr(name)
+
+
+def __dir__():
+  return sorted(list(globals().keys()) + list(__lazy_attrs.keys()))
+
 
 del deprecation_getattr2
 
+# keep "from brainpy import *" exporting the lazy attributes
+__all__ = [k for k in globals().keys() if not k.startswith('_')] + list(__lazy_attrs.keys())
+
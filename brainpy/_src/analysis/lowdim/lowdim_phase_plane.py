@@ -5,7 +5,6 @@ import jax.numpy as jnp
 import numpy as np
 from jax import vmap
 
-from copy import deepcopy
 import brainpy.math as bm
 from brainpy import errors, math
 from brainpy._src.analysis import stability, plotstyle, constants as C, utils
@@ -98,9 +97,11 @@ class PhasePlane1D(Num1DAnalyzer):
     # fixed points and stability analysis
     fps, _, pars = self._get_fixed_points(self.resolutions[self.x_var])
     container = {a: [] for a in stability.get_1d_stability_types()}
+    # the derivatives at all fixed points in one call
+    dfdxs = np.asarray(vmap(self.F_dfxdx)(jnp.asarray(fps))) if len(fps) else []
     for i in range(len(fps)):
       x = fps[i]
-      dfdx = self.F_dfxdx(x)
+      dfdx = dfdxs[i]
       fp_type = stability.stability_analysis(dfdx)
       utils.output(f"Fixed point #{i + 1} at {self.x_var}={x} is a {fp_type}.")
       container[fp_type].append(x)
@@ -109,7 +110,7 @@ class PhasePlane1D(Num1DAnalyzer):
     if with_plot:
       for fp_type, points in container.items():
         if len(points):
-          plot_style = deepcopy(plotstyle.plot_schema[fp_type])
+          plot_style = dict(plotstyle.plot_schema[fp_type])
           pyplot.plot(points, [0] * len(points), **plot_style, label=fp_type)
       pyplot.legend()
       if show:
@@ -351,7 +352,7 @@ class PhasePlane2D(Num2DAnalyzer):
     if with_plot:
       for fp_type, points in container.items():
         if len(points['x']):
-          plot_style = deepcopy(plotstyle.plot_schema[fp_type])
+          plot_style = dict(plotstyle.plot_schema[fp_type])
           pyplot.plot(points['x'], points['y'], **plot_style, label=fp_type)
       pyplot.legend()
       if show:
@@ -1058,7 +1058,7 @@ class PowerLaw(TwoEndConnector):
     return conn
 
 
-@numba_jit
+@numba_jit(no_cpython_wrapper=True)  # only called from other numba functions
 def pos2ind(pos, size):
   idx = 0
   for i, p in enumerate(pos):
@@ -23,6 +23,12 @@ __all__ = [
 ]
 
 
+def _exp_euler_gate(x, alpha, beta, phi, dt):
+  """The exponential Euler step of ``dx/dt = phi * (alpha * (1 - x) - beta * x)``."""
+  x_inf = alpha / (alpha + beta)
+  return x_inf + (x - x_inf) * bm.exp(-phi * (alpha + beta) * dt)
+
+
 class SodiumChannel(IonChannel):
   """Base class for sodium channel dynamics."""
 
@@ -95,7 +101,13 @@ class _INa_p3q_markov_v2(SodiumChannel):
     self.q = variable(bm.zeros, self.mode, self.varshape)
 
     # function
+    self.method = method
     self.integral = odeint(JointEq([self.dp, self.dq]), method=method)
+    # the closed form only holds for the default kinetics, not for the
+    # overridden "dp" or "dq" of a subclass
+    self._closed_form = (method == 'exp_auto' and
+                         type(self).dp is _INa_p3q_markov_v2.dp and
+                         type(self).dq is _INa_p3q_markov_v2.dq)
 
   def reset_state(self, V, C, E, batch_size=None):
     alpha = self.f_p_alpha(V)
@@ -115,11 +127,19 @@ class _INa_p3q_markov_v2(SodiumChannel):
     return self.phi * (self.f_q_alpha(V) * (1. - q) - self.f_q_beta(V) * q)
 
   def update(self, V, C, E):
-    p, q = self.integral(self.p, self.q, share['t'], V, share['dt'])
-    self.p.value, self.q.value = p, q
+    if self._closed_form:
+      # the kinetics are linear in p and q, so that the exponential Euler
+      # step is computed in the closed form without the linearization
+      dt = share['dt']
+      self.p.value = _exp_euler_gate(self.p.value, self.f_p_alpha(V), self.f_p_beta(V), self.phi, dt)
+      self.q.value = _exp_euler_gate(self.q.value, self.f_q_alpha(V), self.f_q_beta(V), self.phi, dt)
+    else:
+      p, q = self.integral(self.p, self.q, share['t'], V, share['dt'])
+      self.p.value, self.q.value = p, q
 
   def current(self, V, C, E):
-    return self.g_max * self.p ** 3 * self.q * (E - V)
+    p = self.p.value
+    return self.g_max * (p * p * p * self.q.value) * (E - V)
 
   def f_p_alpha(self, V):
     raise NotImplementedError
@@ -199,12 +219,14 @@ class INa_Ba2002v2(_INa_p3q_markov_v2):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.32 * temp / (1 - exp(-temp / 4)), finite at temp = 0
     temp = V - self.V_sh - 13.
-    return 0.32 * temp / (1. - bm.exp(-temp / 4.))
+    return 1.28 / bm.exprel(-temp / 4.)
 
   def f_p_beta(self, V):
+    # -0.28 * temp / (1 - exp(temp / 5)), finite at temp = 0
     temp = V - self.V_sh - 40.
-    return -0.28 * temp / (1. - bm.exp(temp / 5.))
+    return 1.4 / bm.exprel(temp / 5.)
 
   def f_q_alpha(self, V):
     return 0.128 * bm.exp(-(V - self.V_sh - 17.) / 18.)
@@ -283,12 +305,14 @@ class INa_TM1991v2(_INa_p3q_markov_v2):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.32 * temp / (exp(temp / 4) - 1), finite at temp = 0
     temp = 13 - V + self.V_sh
-    return 0.32 * temp / (bm.exp(temp / 4) - 1.)
+    return 1.28 / bm.exprel(temp / 4)
 
   def f_p_beta(self, V):
+    # 0.28 * temp / (exp(temp / 5) - 1), finite at temp = 0
     temp = V - self.V_sh - 40
-    return 0.28 * temp / (bm.exp(temp / 5) - 1)
+    return 1.4 / bm.exprel(temp / 5)
 
   def f_q_alpha(self, V):
     return 0.128 * bm.exp((17 - V + self.V_sh) / 18)
@@ -368,8 +392,9 @@ class INa_HH1952v2(_INa_p3q_markov_v2):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.1 * temp / (1 - exp(-temp / 10)), finite at temp = 0
     temp = V - self.V_sh - 5
-    return 0.1 * temp / (1 - bm.exp(-temp / 10))
+    return 1. / bm.exprel(-temp / 10)
 
   def f_p_beta(self, V):
     return 4.0 * bm.exp(-(V - self.V_sh + 20) / 18)
@@ -14,6 +14,7 @@ from brainpy._src.initialize import Initializer, parameter, variable
 from brainpy._src.integrators import odeint, JointEq
 from brainpy.types import ArrayType
 from .base import IonChannel
+from .sodium import _exp_euler_gate
 
 __all__ = [
   'INa_Ba2002',
@@ -79,7 +80,13 @@ class _INa_p3q_markov(IonChannel):
     self.q = variable(bm.zeros, self.mode, self.varshape)
 
     # function
+    self.method = method
     self.integral = odeint(JointEq([self.dp, self.dq]), method=method)
+    # the closed form only holds for the default kinetics, not for the
+    # overridden "dp" or "dq" of a subclass
+    self._closed_form = (method == 'exp_auto' and
+                         type(self).dp is _INa_p3q_markov.dp and
+                         type(self).dq is _INa_p3q_markov.dq)
 
   def reset_state(self, V, batch_size=None):
     alpha = self.f_p_alpha(V)
@@ -99,11 +106,19 @@ class _INa_p3q_markov(IonChannel):
     return self.phi * (self.f_q_alpha(V) * (1. - q) - self.f_q_beta(V) * q)
 
   def update(self, V):
-    p, q = self.integral(self.p, self.q, share['t'], V, share['dt'])
-    self.p.value, self.q.value = p, q
+    if self._closed_form:
+      # the kinetics are linear in p and q, so that the exponential Euler
+      # step is computed in the closed form without the linearization
+      dt = share['dt']
+      self.p.value = _exp_euler_gate(self.p.value, self.f_p_alpha(V), self.f_p_beta(V), self.phi, dt)
+      self.q.value = _exp_euler_gate(self.q.value, self.f_q_alpha(V), self.f_q_beta(V), self.phi, dt)
+    else:
+      p, q = self.integral(self.p, self.q, share['t'], V, share['dt'])
+      self.p.value, self.q.value = p, q
 
   def current(self, V):
-    return self.g_max * self.p ** 3 * self.q * (self.E - V)
+    p = self.p.value
+    return self.g_max * (p * p * p * self.q.value) * (self.E - V)
 
   def f_p_alpha(self, V):
     raise NotImplementedError
@@ -185,12 +200,14 @@ class INa_Ba2002(_INa_p3q_markov):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.32 * temp / (1 - exp(-temp / 4)), finite at temp = 0
     temp = V - self.V_sh - 13.
-    return 0.32 * temp / (1. - bm.exp(-temp / 4.))
+    return 1.28 / bm.exprel(-temp / 4.)
 
   def f_p_beta(self, V):
+    # -0.28 * temp / (1 - exp(temp / 5)), finite at temp = 0
     temp = V - self.V_sh - 40.
-    return -0.28 * temp / (1. - bm.exp(temp / 5.))
+    return 1.4 / bm.exprel(temp / 5.)
 
   def f_q_alpha(self, V):
     return 0.128 * bm.exp(-(V - self.V_sh - 17.) / 18.)
@@ -271,12 +288,14 @@ class INa_TM1991(_INa_p3q_markov):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.32 * temp / (exp(temp / 4) - 1), finite at temp = 0
     temp = 13 - V + self.V_sh
-    return 0.32 * temp / (bm.exp(temp / 4) - 1.)
+    return 1.28 / bm.exprel(temp / 4)
 
   def f_p_beta(self, V):
+    # 0.28 * temp / (exp(temp / 5) - 1), finite at temp = 0
     temp = V - self.V_sh - 40
-    return 0.28 * temp / (bm.exp(temp / 5) - 1)
+    return 1.4 / bm.exprel(temp / 5)
 
   def f_q_alpha(self, V):
     return 0.128 * bm.exp((17 - V + self.V_sh) / 18)
@@ -358,8 +377,9 @@ class INa_HH1952(_INa_p3q_markov):
     self.V_sh = parameter(V_sh, self.varshape, allow_none=False)
 
   def f_p_alpha(self, V):
+    # 0.1 * temp / (1 - exp(-temp / 10)), finite at temp = 0
     temp = V - self.V_sh - 5
-    return 0.1 * temp / (1 - bm.exp(-temp / 10))
+    return 1. / bm.exprel(-temp / 10)
 
   def f_p_beta(self, V):
     return 4.0 * bm.exp(-(V - self.V_sh + 20) / 18)
@@ -29,3 +29,53 @@ class Test_Na(parameterized.TestCase):
     self.assertTupleEqual(runner.mon['INa_2.q'].shape, (100, 1))
     self.assertTupleEqual(runner.mon['INa_3.p'].shape, (100, 1))
     self.assertTupleEqual(runner.mon['INa_3.q'].shape, (100, 1))
+
+  @parameterized.product(
+    cls=[bp.dyn.INa_HH1952, bp.dyn.INa_TM1991, bp.dyn.INa_Ba2002]
+  )
+  def test_Na_exp_auto_closed_form(self, cls):
+    class Neuron(bp.dyn.CondNeuGroup):
+      def __init__(self, size, method):
+        super(Neuron, self).__init__(size, V_initializer=bp.init.Constant(-65.))
+        self.INa = cls(size, method=method)
+
+    mons = []
+    for method in ['exp_auto', 'exponential_euler']:
+      runner = bp.DSRunner(Neuron(1, method), monitors=['INa.p', 'INa.q'], progress_bar=False)
+      runner.run(10.)
+      mons.append(runner.mon)
+    self.assertTrue(bm.allclose(mons[0]['INa.p'], mons[1]['INa.p'], rtol=1e-4, atol=1e-6))
+    self.assertTrue(bm.allclose(mons[0]['INa.q'], mons[1]['INa.q'], rtol=1e-4, atol=1e-6))
+
+  def test_Na_rates_at_removable_singularity(self):
+    ch = bp.dyn.INa_Ba2002(1, V_sh=-50.)
+    self.assertTrue(bm.isfinite(ch.f_p_alpha(bm.asarray([-37.]))).all())
+    self.assertTrue(bm.isfinite(ch.f_p_beta(bm.asarray([-10.]))).all())
+    ch = bp.dyn.INa_HH1952(1, V_sh=-45.)
+    self.assertTrue(bm.isfinite(ch.f_p_alpha(bm.asarray([-40.]))).all())
+
+  @parameterized.product(
+    cls=[bp.dyn.INa_HH1952, bp.dyn.INa_HH1952v2]
+  )
+  def test_Na_exp_auto_subclass_kinetics(self, cls):
+    class FrozenINa(cls):
+      def dp(self, p, t, V):
+        return bm.zeros_like(p)
+
+    self.assertTrue(cls(1)._closed_form)
+    self.assertFalse(cls(1, method='exponential_euler')._closed_form)
+    self.assertFalse(FrozenINa(1)._closed_form)
+
+  def test_Na_exp_auto_subclass_kinetics_run(self):
+    class FrozenINa(bp.dyn.INa_HH1952):
+      def dp(self, p, t, V):
+        return bm.zeros_like(p)
+
+    class Neuron(bp.dyn.CondNeuGroup):
+      def __init__(self, size):
+        super(Neuron, self).__init__(size, V_initializer=bp.init.Constant(-65.))
+        self.INa = FrozenINa(size)
+
+    runner = bp.DSRunner(Neuron(1), monitors=['INa.p'], progress_bar=False)
+    runner.run(1.)
+    self.assertTrue(bm.allclose(runner.mon['INa.p'], runner.mon['INa.p'][0]))
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import jax.numpy as jnp
 import numpy as np
 
 import brainpy as bp
@@ -14,19 +15,14 @@ class Test_lif(parameterized.TestCase):
   )
   def test_run_shape(self, neuron):
     model = getattr(lif, neuron)(size=1)
-    if neuron in ['IF', 'IFLTC']:
-      runner = bp.DSRunner(model,
-                           monitors=['V'],
-                           progress_bar=False)
-      runner.run(10.)
-      self.assertTupleEqual(runner.mon['V'].shape, (100, 1))
-    else:
-      runner = bp.DSRunner(model,
-                           monitors=['V', 'spike'],
-                           progress_bar=False)
-      runner.run(10.)
-      self.assertTupleEqual(runner.mon['V'].shape, (100, 1))
-      self.assertTupleEqual(runner.mon['spike'].shape, (100, 1))
+    # "IF" and "IFLTC" have no spike
+    monitors = ['V'] if neuron in ['IF', 'IFLTC'] else ['V', 'spike']
+    runner = bp.DSRunner(model,
+                         monitors=monitors,
+                         progress_bar=False)
+    runner.run(10.)
+    for key in monitors:
+      self.assertTupleEqual(runner.mon[key].shape, (100, 1))
 
   @parameterized.named_parameters(
     {'testcase_name': f'{name}', 'neuron': name}
@@ -56,7 +52,12 @@ class Test_lif(parameterized.TestCase):
                                     mode=bm.training_mode,
                                     spk_reset='hard',
                                     scaling=bm.Scaling(scale=1, bias=0))
-      indices = bm.arange(5000)
-      spks1 = bm.for_loop(lambda i: model1.step_run(i, 10./model1.scaling.scale), indices, jit=True)
-      spks2 = bm.for_loop(lambda i: model2.step_run(i, 10./model2.scaling.scale), indices, jit=True)
-      self.assertTrue(np.allclose(spks1, spks2))
\ No newline at end of file
+      indices = jnp.arange(5000, dtype=jnp.int32)
+
+      def step(c, i):
+        spk1 = model1.step_run(i, 10./model1.scaling.scale)
+        spk2 = model2.step_run(i, 10./model2.scaling.scale)
+        return c, (spk1, spk2)
+
+      _, (spks1, spks2) = bm.jit(lambda: bm.scan(step, None, indices))()
+      self.assertTrue(np.allclose(spks1, spks2))
@@ -17,9 +17,11 @@ from jax.tree_util import register_pytree_node_class
 from brainpy._src.math import defaults
 from brainpy._src.math.modes import Mode
 from brainpy._src.math.ndarray import (Array, )
-from brainpy._src.math.object_transform.collectors import (ArrayCollector, Collector)
+from brainpy._src.math.object_transform.collectors import (ArrayCollector, Collector, _missing)
 from brainpy._src.math.object_transform.naming import (get_unique_name,
-                                                       check_name_uniqueness)
+                                                       check_name_uniqueness,
+                                                       get_topology_version,
+                                                       bump_topology_version)
 from brainpy._src.math.object_transform.variables import (Variable, VariableView, TrainVar,
                                                           VarList, VarDict)
 from brainpy._src.math.sharding import BATCH_AXIS
@@ -28,6 +30,9 @@ variable_ = None
 StateLoadResult = namedtuple('StateLoadResult', ['missing_keys', 'unexpected_keys'])
 registered = set()
 
+# the attributes used for caching, which are not a part of the object
+_cache_attrs = ('_var_attr_names', '_topology_cache')
+
 __all__ = [
   'BrainPyObject', 'Base', 'FunAsObject', 'ObjectTransform',
 
@@ -121,7 +126,31 @@ class BrainPyObject(object):
     return self._implicit_nodes
 
   def setattr(self, key: str, value: Any) -> None:
+    old = self.__dict__.get(key)
     super().__setattr__(key, value)
+    self._attr_changed(old, value)
+
+  def _attr_changed(self, old: Any, new: Any) -> None:
+    # only nodes and variables change the cached results
+    if isinstance(old, _topology_types) or isinstance(new, _topology_types):
+      self.__dict__.pop('_var_attr_names', None)
+      bump_topology_version()
+
+  def invalidate_cache(self) -> None:
+    """Invalidate the cached results of :py:meth:`~.nodes` and :py:meth:`~.vars`.
+
+    The caches are automatically invalidated when a node or a variable is set or
+    deleted as an attribute, is registered as an implicit node or variable, or
+    when any ``NodeList``, ``NodeDict``, ``VarList`` or ``VarDict`` is changed.
+    This function is only needed when the hierarchy is changed by bypassing these
+    APIs, for example by writing into ``__dict__`` directly, or by changing
+    ``implicit_vars`` or ``implicit_nodes`` without :py:meth:`~.register_implicit_vars`
+    or :py:meth:`~.register_implicit_nodes`.
+
+    .. versionadded:: 2.6.1
+    """
+    self.__dict__.pop('_var_attr_names', None)
+    bump_topology_version()
 
   def tracing_variable(
       self,
@@ -211,12 +240,33 @@ class BrainPyObject(object):
       key: str. The attribute.
       value: Any. The value.
     """
-    if key in self.__dict__:
-      val = self.__dict__[key]
-      if isinstance(val, Variable):
-        val.value = value
-        return
+    val = self.__dict__.get(key)
+    if isinstance(val, Variable):
+      val.value = value
+      return
     super().__setattr__(key, value)
+    self._attr_changed(val, value)
+
+  def __delattr__(self, key: str) -> None:
+    val = self.__dict__.get(key)
+    super().__delattr__(key)
+    self._attr_changed(val, None)
+
+  def _get_var_attr_names(self) -> Tuple[str, ...]:
+    """The names of attributes holding a :py:class:`~.Variable`, ``VarList`` or ``VarDict``.
+
+    The names are cached until an attribute holding a node or a variable is set or deleted.
+    """
+    names = self.__dict__.get('_var_attr_names')
+    if names is None:
+      names = tuple(k for k, v in self.__dict__.items()
+                    if k not in self._excluded_vars and isinstance(v, (Variable, VarList, VarDict)))
+      self.__dict__['_var_attr_names'] = names
+    return names
+
+  def __getstate__(self):
+    # the caches refer to this object, so they are not shared with its copies
+    return {k: v for k, v in self.__dict__.items() if k not in _cache_attrs}
 
   def tree_flatten(self):
     """Flattens the object as a PyTree.
@@ -235,6 +285,8 @@ class BrainPyObject(object):
     static_names = []
     static_values = []
     for k, v in self.__dict__.items():
+      if k in _cache_attrs:  # cache, not a part of the tree
+        continue
       if isinstance(v, (BrainPyObject, Variable, NodeList, NodeDict, VarList, VarDict)):
         # if isinstance(v, (BrainPyObject, Variable)):
         dynamic_names.append(k)
@@ -267,54 +319,61 @@ class BrainPyObject(object):
   def name(self, name: str = None):
     self._name = self.unique_name(name=name)
     check_name_uniqueness(name=self._name, obj=self)
+    bump_topology_version()  # absolute paths are changed
 
   def register_implicit_vars(self, *variables, var_cls: type = None, **named_variables):
     if var_cls is None:
       var_cls = (Variable, VarList, VarDict)
 
+    implicit_vars = self.implicit_vars
     for variable in variables:
       if isinstance(variable, var_cls):
-        self.implicit_vars[f'var{id(variable)}'] = variable
+        implicit_vars[f'var{id(variable)}'] = variable
       elif isinstance(variable, (tuple, list)):
         for v in variable:
-          if not isinstance(v, var_cls):
-            raise ValueError(f'Must be instance of {var_cls}, but we got {type(v)}')
-          self.implicit_vars[f'var{id(v)}'] = v
+          _register_implicit(implicit_vars, f'var{id(v)}', v, var_cls)
       elif isinstance(variable, dict):
         for k, v in variable.items():
-          if not isinstance(v, var_cls):
-            raise ValueError(f'Must be instance of {var_cls}, but we got {type(v)}')
-          self.implicit_vars[k] = v
+          _register_implicit(implicit_vars, k, v, var_cls)
       else:
         raise ValueError(f'Unknown type: {type(variable)}')
     for key, variable in named_variables.items():
-      if not isinstance(variable, var_cls):
-        raise ValueError(f'Must be instance of {var_cls}, but we got {type(variable)}')
-      self.implicit_vars[key] = variable
+      _register_implicit(implicit_vars, key, variable, var_cls)
+    bump_topology_version()
 
   def register_implicit_nodes(self, *nodes, node_cls: type = None, **named_nodes):
     if node_cls is None:
       node_cls = (BrainPyObject, NodeList, NodeDict)
 
+    implicit_nodes = self.implicit_nodes
     for node in nodes:
       if isinstance(node, node_cls):
-        self.implicit_nodes[node.name] = node
+        implicit_nodes[node.name] = node
       elif isinstance(node, (tuple, list)):
         for n in node:
-          if not isinstance(n, node_cls):
-            raise ValueError(f'Must be instance of {node_cls.__name__}, but we got {type(n)}')
-          self.implicit_nodes[n.name] = n
+          _register_implicit(implicit_nodes, getattr(n, 'name', None), n, node_cls)
       elif isinstance(node, dict):
         for k, n in node.items():
-          if not isinstance(n, node_cls):
-            raise ValueError(f'Must be instance of {node_cls.__name__}, but we got {type(n)}')
-          self.implicit_nodes[k] = n
+          _register_implicit(implicit_nodes, k, n, node_cls)
       else:
         raise ValueError(f'Unknown type: {type(node)}')
     for key, node in named_nodes.items():
-      if not isinstance(node, node_cls):
-        raise ValueError(f'Must be instance of {node_cls.__name__}, but we got {type(node)}')
-      self.implicit_nodes[key] = node
+      _register_implicit(implicit_nodes, key, node, node_cls)
+    bump_topology_version()
+
+  def _get_cache(self, key):
+    cache = self.__dict__.get('_topology_cache')
+    if cache is not None and cache[0] == get_topology_version():
+      return cache[1].get(key)
+    return None
+
+  def _set_cache(self, key, value):
+    version = get_topology_version()
+    cache = self.__dict__.get('_topology_cache')
+    if cache is None or cache[0] != version:
+      cache = (version, dict())
+      self.__dict__['_topology_cache'] = cache
+    cache[1][key] = value
 
   def vars(
       self,
@@ -343,13 +402,20 @@ class BrainPyObject(object):
     """
     if exclude_types is None:
       exclude_types = (VariableView,)
+    cache_key = ('vars', method, level, include_self, exclude_types)
+    gather = self._get_cache(cache_key)
+    if gather is None:
+      gather = self._find_vars(method=method, level=level, include_self=include_self, exclude_types=exclude_types)
+      self._set_cache(cache_key, gather)
+    return ArrayCollector(gather)
+
+  def _find_vars(self, method, level, include_self, exclude_types):
     nodes = self.nodes(method=method, level=level, include_self=include_self)
     gather = ArrayCollector()
     for node_path, node in nodes.items():
-      for k in node.__dict__.keys():
-        if k in node._excluded_vars:
-          continue
-        v = getattr(node, k)
+      attrs = node.__dict__
+      for k in node._get_var_attr_names():
+        v = attrs[k]
         if isinstance(v, Variable) and not isinstance(v, exclude_types):
           gather[f'{node_path}.{k}' if node_path else k] = v
         elif isinstance(v, VarList):
@@ -360,8 +426,10 @@ class BrainPyObject(object):
           for kk, vv in v.items():
             if not isinstance(vv, exclude_types):
               gather[f'{node_path}.{k}-{kk}' if node_path else k] = vv
-      # implicit vars
-      gather.update({f'{node_path}.{k}': v for k, v in node.implicit_vars.items()})
+      # implicit vars, without creating an empty collector for every node
+      implicit_vars = attrs.get('_implicit_vars')
+      if implicit_vars:
+        gather.update({f'{node_path}.{k}': v for k, v in implicit_vars.items()})
     return gather
 
   def train_vars(self, method='absolute', level=-1, include_self=True):
@@ -383,76 +451,44 @@ class BrainPyObject(object):
     """
     return self.vars(method=method, level=level, include_self=include_self).subset(TrainVar)
 
-  def _find_nodes(self, method='absolute', level=-1, include_self=True, _lid=0, _paths=None):
-    if _paths is None:
-      _paths = set()
+  def _find_nodes(self, method='absolute', level=-1, include_self=True, unique=False):
+    if method not in ('absolute', 'relative'):
+      raise ValueError(f'No support for the method of "{method}".')
     gather = Collector()
     if include_self:
-      if method == 'absolute':
-        gather[self.name] = self
-      elif method == 'relative':
-        gather[''] = self
-      else:
-        raise ValueError(f'No support for the method of "{method}".')
-    if (level > -1) and (_lid >= level):
-      return gather
-    if method == 'absolute':
-      nodes = []
-      for k, v in self.__dict__.items():
-        if isinstance(v, BrainPyObject):
-          _add_node2(self, v, _paths, gather, nodes)
-        elif isinstance(v, NodeList):
-          for v2 in v:
-            _add_node2(self, v2, _paths, gather, nodes)
-        elif isinstance(v, NodeDict):
-          for v2 in v.values():
-            if isinstance(v2, BrainPyObject):
-              _add_node2(self, v2, _paths, gather, nodes)
-
-      # implicit nodes
-      for node in self.implicit_nodes.values():
-        _add_node2(self, node, _paths, gather, nodes)
-
-      # finding nodes recursively
-      for v in nodes:
-        gather.update(v._find_nodes(method=method,
-                                    level=level,
-                                    _lid=_lid + 1,
-                                    _paths=_paths,
-                                    include_self=include_self))
-
-    elif method == 'relative':
-      nodes = []
-      for k, v in self.__dict__.items():
-        if isinstance(v, BrainPyObject):
-          _add_node1(self, k, v, _paths, gather, nodes)
-        elif isinstance(v, NodeList):
-          for i, v2 in enumerate(v):
-            _add_node1(self, k + '-' + str(i), v2, _paths, gather, nodes)
-        elif isinstance(v, NodeDict):
-          for k2, v2 in v.items():
-            if isinstance(v2, BrainPyObject):
-              _add_node1(self, k + '.' + k2, v2, _paths, gather, nodes)
-
-      # implicit nodes
-      for key, node in self.implicit_nodes.items():
-        _add_node1(self, key, node, _paths, gather, nodes)
-
-      # finding nodes recursively
-      for k1, v1 in nodes:
-        for k2, v2 in v1._find_nodes(method=method,
-                                     _paths=_paths,
-                                     _lid=_lid + 1,
-                                     level=level,
-                                     include_self=include_self).items():
-          if k2:
-            gather[f'{k1}.{k2}'] = v2
-
-    else:
-      raise ValueError(f'No support for the method of "{method}".')
+      gather[self.name if method == 'absolute' else ''] = self
+    # Depth-first search with an explicit stack. Each (parent, child) edge is
+    # followed once, so that a node shared by several parents is gathered under
+    # all of its relative paths. With ``unique=True``, each node is followed
+    # only once, whichever parent it is reached from.
+    # With a limited level, an edge (or a node) first followed at a deeper level
+    # is followed again when it is reached at a shallower one, so that the
+    # children within the level are not missed.
+    # (A node is gathered again only with the new relative path of the edge.)
+    seen = {id(self): 0} if unique else {}
+    stack = [('', self, 0)]
+    while stack:
+      path, node, lid = stack.pop()
+      if (level > -1) and (lid >= level):
+        continue
+      children = []
+      for key, child in _node_children(node):
+        mark = id(child) if unique else (id(node), id(child))
+        depth = seen.get(mark)
+        if depth is not None and (level == -1 or depth <= lid + 1):
+          continue
+        seen[mark] = lid + 1
+        if method == 'absolute':
+          key = child.name
+        elif path:
+          key = f'{path}.{key}'
+        if depth is None or not unique:
+          gather[key] = child
+        children.append((key, child, lid + 1))
+      stack.extend(reversed(children))
     return gather
 
-  def nodes(self, method='absolute', level=-1, include_self=True):
+  def nodes(self, method='absolute', level=-1, include_self=True, unique=False):
     """Collect all children nodes.
 
     Parameters
@@ -463,13 +499,24 @@ class BrainPyObject(object):
       The hierarchy level to find nodes.
     include_self: bool
       Whether include the self.
+    unique: bool
+      Whether a node shared by several parents is only collected once.
+      If ``False`` (default), with ``method='relative'`` such a node is
+      collected under the path from each of its parents.
+
+      .. versionadded:: 2.6.1
 
     Returns
     -------
     gather : Collector
       The collection contained (the path, the node).
     """
-    return self._find_nodes(method=method, level=level, include_self=include_self)
+    cache_key = ('nodes', method, level, include_self, unique)
+    gather = self._get_cache(cache_key)
+    if gather is None:
+      gather = self._find_nodes(method=method, level=level, include_self=include_self, unique=unique)
+      self._set_cache(cache_key, gather)
+    return Collector(gather)
 
   def unique_name(self, name=None, type_=None):
     """Get the unique name for this object.
@@ -506,18 +553,20 @@ class BrainPyObject(object):
 
   def __save_state__(self, **kwargs) -> Dict:
     """Save states. """
-    return self.vars(include_self=True, level=0).unique().dict()
+    return self._unique_vars(level=0).dict()
 
   def __load_state__(self, state_dict: Dict, **kwargs) -> Optional[Tuple[Sequence[str], Sequence[str]]]:
     """Load states from the external objects."""
-    variables = self.vars(include_self=True, level=0).unique()
-    keys1 = set(state_dict.keys())
-    keys2 = set(variables.keys())
-    for key in keys2.intersection(keys1):
-      variables[key].value = jax.numpy.asarray(state_dict[key])
-    unexpected_keys = list(keys1 - keys2)
-    missing_keys = list(keys2 - keys1)
-    return unexpected_keys, missing_keys
+    return _load_variables(self._unique_vars(level=0), state_dict)
+
+  def _unique_vars(self, level=-1):
+    """The unique variables, which are cached until the object topology is changed."""
+    cache_key = ('unique_vars', level)
+    variables = self._get_cache(cache_key)
+    if variables is None:
+      variables = self.vars(include_self=True, level=level).unique()
+      self._set_cache(cache_key, variables)
+    return variables
 
   def state_dict(self, **kwargs) -> dict:
     """Returns a dictionary containing a whole state of the module.
@@ -558,13 +607,7 @@ class BrainPyObject(object):
       * **unexpected_keys** is a list of str containing the unexpected keys
     """
     if compatible == 'v1':
-      variables = self.vars().unique()
-      keys1 = set(state_dict.keys())
-      keys2 = set(variables.keys())
-      unexpected_keys = list(keys1 - keys2)
-      missing_keys = list(keys2 - keys1)
-      for key in keys2.intersection(keys1):
-        variables[key].value = jax.numpy.asarray(state_dict[key])
+      unexpected_keys, missing_keys = _load_variables(self._unique_vars(), state_dict)
     elif compatible == 'v2':
       nodes = self.nodes()
       missing_keys = []
@@ -610,20 +653,43 @@ class BrainPyObject(object):
     return self.to(device=jax.devices('tpu')[0])
 
 
-def _add_node2(self, v, _paths, gather, nodes):
-  path = (id(self), id(v))
-  if path not in _paths:
-    _paths.add(path)
-    gather[v.name] = v
-    nodes.append(v)
+def _register_implicit(collector, key, value, cls):
+  if not isinstance(value, cls):
+    raise ValueError(f'Must be instance of {cls}, but we got {type(value)}')
+  collector[key] = value
 
 
-def _add_node1(self, k, v, _paths, gather, nodes):
-  path = (id(self), id(v))
-  if path not in _paths:
-    _paths.add(path)
-    gather[k] = v
-    nodes.append((k, v))
+def _load_variables(variables, state_dict):
+  """Load the values in ``state_dict`` into ``variables``.
+
+  Returns the unexpected keys and the missing keys.
+  """
+  unexpected_keys = []
+  for key, value in state_dict.items():
+    if key in variables:
+      variables[key].value = jax.numpy.asarray(value)
+    else:
+      unexpected_keys.append(key)
+  missing_keys = [key for key in variables.keys() if key not in state_dict]
+  return unexpected_keys, missing_keys
+
+
+def _node_children(node):
+  """Iterate over the (relative key, child) of the children nodes."""
+  for k, v in node.__dict__.items():
+    if isinstance(v, BrainPyObject):
+      yield k, v
+    elif isinstance(v, NodeList):
+      for i, v2 in enumerate(v):
+        yield f'{k}-{i}', v2
+    elif isinstance(v, NodeDict):
+      for k2, v2 in v.items():
+        if isinstance(v2, BrainPyObject):
+          yield f'{k}.{k2}', v2
+  # implicit nodes
+  implicit_nodes = node.__dict__.get('_implicit_nodes')
+  if implicit_nodes:
+    yield from implicit_nodes.items()
 
 
 Base = BrainPyObject
@@ -724,6 +790,7 @@ class NodeList(list):
     # if not isinstance(element, BrainPyObject):
     #   raise TypeError(f'element must be an instance of {BrainPyObject.__name__}.')
     super().append(element)
+    bump_topology_version()
     return self
 
   def extend(self, iterable) -> 'NodeList':
@@ -731,6 +798,51 @@ class NodeList(list):
       self.append(element)
     return self
 
+  # The other list mutations change the collected nodes (or their
+  # indices), so that the cached results of ``nodes()`` and ``vars()``
+  # must be dropped.
+
+  def __setitem__(self, key, value):
+    super().__setitem__(key, value)
+    bump_topology_version()
+
+  def __delitem__(self, key):
+    super().__delitem__(key)
+    bump_topology_version()
+
+  def __iadd__(self, other) -> 'NodeList':
+    return self.extend(other)
+
+  def __imul__(self, n) -> 'NodeList':
+    super().__imul__(n)
+    bump_topology_version()
+    return self
+
+  def insert(self, index, element):
+    super().insert(index, element)
+    bump_topology_version()
+
+  def pop(self, index=-1):
+    element = super().pop(index)
+    bump_topology_version()
+    return element
+
+  def remove(self, element):
+    super().remove(element)
+    bump_topology_version()
+
+  def clear(self):
+    super().clear()
+    bump_topology_version()
+
+  def reverse(self):
+    super().reverse()
+    bump_topology_version()
+
+  def sort(self, *args, **kwargs):
+    super().sort(*args, **kwargs)
+    bump_topology_version()
+
 
 node_list = NodeList
 
@@ -757,18 +869,51 @@ class NodeDict(dict):
           self[k] = v
       elif isinstance(arg, tuple):
         assert len(arg) == 2
-        self[arg[0]] = args[1]
+        self[arg[0]] = arg[1]
     for k, v in kwargs.items():
       self[k] = v
     return self
 
   def __setitem__(self, key, value) -> 'NodeDict':
     if self.check_unique:
-      exist = self.get(key, None)
-      if id(exist) != id(value):
+      exist = dict.get(self, key, _missing)
+      if exist is not _missing and exist is not value:
         raise KeyError(f'Duplicate usage of key "{key}". "{key}" has been used for {value}.')
     super().__setitem__(key, value)
+    bump_topology_version()
     return self
 
+  # The other dict mutations change the collected nodes, so that the
+  # cached results of ``nodes()`` and ``vars()`` must be dropped.
+
+  def __delitem__(self, key):
+    super().__delitem__(key)
+    bump_topology_version()
+
+  def __ior__(self, other) -> 'NodeDict':
+    return self.update(other)
+
+  def setdefault(self, key, default=None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def pop(self, key, *args):
+    value = super().pop(key, *args)
+    bump_topology_version()
+    return value
+
+  def popitem(self):
+    item = super().popitem()
+    bump_topology_version()
+    return item
+
+  def clear(self):
+    super().clear()
+    bump_topology_version()
+
 
 node_dict = NodeDict
+
+# the types whose (un)registration changes the object topology
+_topology_types = (BrainPyObject, Variable, NodeList, NodeDict, VarList, VarDict)
@@ -9,23 +9,35 @@ __all__ = [
   'Collector', 'ArrayCollector', 'TensorCollector',
 ]
 
+_missing = object()
+
 
 class Collector(dict):
   """A Collector is a dictionary (name, var) with some additional methods to make manipulation
   of collections of variables easy. A Collector is ordered by insertion order. It is the object
   returned by BrainPyObject.vars() and used as input in many Collector instance: optimizers, jit, etc..."""
 
+  def _check_value(self, value):
+    """Check the value to be stored, which is overridden by the subclasses."""
+    pass
+
   def __setitem__(self, key, value):
     """Overload bracket assignment to catch potential conflicts during assignment."""
-    if key in self:
-      if id(self[key]) != id(value):
-        raise ValueError(f'Name "{key}" conflicts: same name for {value} and {self[key]}.')
+    old = dict.get(self, key, _missing)
+    if old is not _missing and old is not value:
+      raise ValueError(f'Name "{key}" conflicts: same name for {value} and {old}.')
     dict.__setitem__(self, key, value)
 
   def replace(self, key, new_value):
-    """Replace the original key with the new value."""
-    self.pop(key)
-    self[key] = new_value
+    """Replace the original key with the new value.
+
+    The key keeps its original position in the collector.
+    """
+    if key not in self:
+      raise KeyError(key)
+    self._check_value(new_value)
+    # the old value is discarded, so there is nothing to conflict with
+    dict.__setitem__(self, key, new_value)
 
   def update(self, other, **kwargs):
     assert isinstance(other, (dict, list, tuple))
@@ -78,7 +90,7 @@ class Collector(dict):
     if isinstance(other, dict):
       for key, val in other.items():
         if key in gather:
-          if id(val) != id(gather[key]):
+          if val is not gather[key]:
             raise ValueError(f'Cannot remove {key}, because we got two different values: '
                              f'{val} != {gather[key]}')
           gather.pop(key)
@@ -135,32 +147,18 @@ class Collector(dict):
     var_type : type
       The type/class to match.
     """
-    gather = type(self)()
-    for key, value in self.items():
-      if isinstance(value, var_type):
-        gather[key] = value
-    return gather
+    # the keys are already unique, so that the items are
+    # not checked again by ``__setitem__()``
+    return type(self)((k, v) for k, v in self.items() if isinstance(v, var_type))
 
   def not_subset(self, var_type):
-    gather = type(self)()
-    for key, value in self.items():
-      if not isinstance(value, var_type):
-        gather[key] = value
-    return gather
+    return type(self)((k, v) for k, v in self.items() if not isinstance(v, var_type))
 
   def include(self, *types):
-    gather = type(self)()
-    for key, value in self.items():
-      if value.__class__ in types:
-        gather[key] = value
-    return gather
+    return type(self)((k, v) for k, v in self.items() if v.__class__ in types)
 
   def exclude(self, *types):
-    gather = type(self)()
-    for key, value in self.items():
-      if value.__class__ not in types:
-        gather[key] = value
-    return gather
+    return type(self)((k, v) for k, v in self.items() if v.__class__ not in types)
 
   def unique(self):
     """Get a new type of collector with unique values.
@@ -168,32 +166,26 @@ class Collector(dict):
     If one value is assigned to two or more keys,
     then only one pair of (key, value) will be returned.
     """
-    gather = type(self)()
-    seen = set()
+    gather = dict()
     for k, v in self.items():
-      if id(v) not in seen:
-        seen.add(id(v))
-        gather[k] = v
-    return gather
+      gather.setdefault(id(v), (k, v))
+    return type(self)(gather.values())
 
 
 class ArrayCollector(Collector):
+  def _check_value(self, value):
+    # "type() is" is the common case, which is cheaper than "isinstance()"
+    assert type(value) is Variable or isinstance(value, Variable), type(value)
+
   def __setitem__(self, key, value):
     """Overload bracket assignment to catch potential conflicts during assignment."""
-
-    assert isinstance(value, Variable), type(value)
-    if key in self:
-      if id(self[key]) != id(value):
-        raise ValueError(f'Name "{key}" conflicts: same name for {value} and {self[key]}.')
-    dict.__setitem__(self, key, value)
+    self._check_value(value)
+    super().__setitem__(key, value)
 
   def dict(self):
     """Get a dict with the key and the value data.
     """
-    gather = dict()
-    for k, v in self.items():
-      gather[k] = v.value
-    return gather
+    return {k: v.value for k, v in self.items()}
 
   def data(self):
     """Get all data in each value."""
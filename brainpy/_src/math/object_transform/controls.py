@@ -24,7 +24,6 @@ from .tools import (
   eval_shape,
   dynvar_deprecation,
   node_deprecation,
-  abstract
 )
 from .variables import (Variable, VariableStack)
 
@@ -706,11 +705,6 @@ def ifelse(
     return res
 
 
-def _loop_abstractify(x):
-  x = abstract(x)
-  return jax.core.mapped_aval(x.shape[0], 0, x)
-
-
 def _get_for_loop_transform(
     body_fun,
     dyn_vars,
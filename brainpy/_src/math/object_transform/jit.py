@@ -7,17 +7,26 @@ The JIT compilation tools for JAX backend.
 
 """
 
+import inspect
+import operator
+import os
+import threading
+import warnings
+import weakref
+from collections import deque
 from functools import partial, wraps
-from typing import Callable, Union, Optional, Sequence, Dict, Any, Iterable
+from typing import Callable, Union, Optional, Sequence, Dict, Any, Iterable, Tuple
 
 import jax
+import jax.numpy as jnp
 
 from brainpy import tools, check
 from .base import BrainPyObject, ObjectTransform
-from .naming import get_stack_cache, cache_stack
+from .naming import get_stack_cache, cache_stack, remove_stack_cache
 from .tools import (dynvar_deprecation,
                     node_deprecation,
-                    eval_shape)
+                    eval_shape,
+                    touch_no_variable)
 from .variables import (Variable, VariableStack)
 from ..ndarray import Array
 
@@ -46,22 +55,11 @@ def get_shardings(args):
                                 is_leaf=_is_bp_array)
 
 
-def _is_rng(a):
+def _get_rng_type():
   global RandomState
   if RandomState is None:
     from brainpy.math.random import RandomState
-  return isinstance(a, RandomState)
-
-
-def _is_not_rng(a):
-  global RandomState
-  if RandomState is None:
-    from brainpy.math.random import RandomState
-  return not isinstance(a, RandomState)
-
-
-def _rng_split_key(a):
-  return a.split_key()
+  return RandomState
 
 
 def _seq_of_int(static_argnums):
@@ -88,14 +86,148 @@ def _seq_of_str(static_argnames):
   return static_argnames
 
 
-def _jit_call_take_care_of_rngs(transform, stack, *args, **kwargs):
+def _resolve_static_args(fun, static_argnums, static_argnames, skip_first=False):
+  """Complete ``static_argnums`` and ``static_argnames`` with each other according to
+  the signature of ``fun``, so that ``jax.jit`` does not need to inspect the function."""
+  try:
+    parameters = tuple(inspect.signature(fun).parameters.values())
+  except (TypeError, ValueError):  # no signature, pass them through
+    return tuple(static_argnums), tuple(static_argnames)
+  if skip_first:
+    parameters = parameters[1:]
+  positional = [p for p in parameters
+                if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+  names = [p.name for p in positional]
+  static_argnums = set(static_argnums)
+  static_argnames = list(static_argnames)
+  for name in static_argnames:
+    if name in names:
+      static_argnums.add(names.index(name))
+  for i in tuple(static_argnums):
+    if 0 <= i < len(positional):
+      p = positional[i]
+      if p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD and p.name not in static_argnames:
+        static_argnames.append(p.name)
+  return tuple(sorted(static_argnums)), tuple(static_argnames)
+
+
+def _support_donation():
+  # buffer donation is not usable on CPU, XLA only warns for every donated buffer
+  return jax.default_backend() != 'cpu'
+
+
+def _get_donate_argnums(donate_argnums, donate_variables):
+  # the transformed function receives the variable data as its first argument
+  donate_argnums = tuple(a + 1 for a in _seq_of_int(donate_argnums))
+  if donate_variables and _support_donation():
+    donate_argnums = (0,) + donate_argnums
+  return donate_argnums
+
+
+def _set_persistent_cache_dir(path: str):
+  # compiled executables are persisted in "path" and reused by later processes,
+  # but each process still needs to trace the function once
+  path = os.path.abspath(os.path.expanduser(path))
+  current = jax.config.jax_compilation_cache_dir
+  if current is None:
+    jax.config.update("jax_compilation_cache_dir", path)
+  elif os.path.abspath(os.path.expanduser(current)) != path:
+    # JAX has one compilation cache per process
+    warnings.warn(f'The persistent compilation cache is already set to "{current}", '
+                  f'the cache directory "{path}" is ignored.',
+                  UserWarning)
+
+
+if os.environ.get('BRAINPY_JIT_CACHE_DIR'):
+  _set_persistent_cache_dir(os.environ['BRAINPY_JIT_CACHE_DIR'])
+
+
+# The compiled functions shared among the JITTransform instances of the same function.
+# Each one holds a strong reference of its function, so the function id in the key
+# cannot be reused while the entry is alive, and the entry is dropped once no
+# JITTransform uses it any more.
+_jit_cache = weakref.WeakValueDictionary()
+
+
+def _fun_id(fun):
+  # a bound method is recreated at every attribute access
+  if inspect.ismethod(fun):
+    return id(fun.__self__), id(fun.__func__)
+  return id(fun)
+
+
+class _Compiled(object):
+  """The traced and compiled function of a :py:class:`~.JITTransform`."""
+  __slots__ = ('fun', 'dyn_vars', 'var_refs', 'rng_refs', 'donate_argnums', 'transform', '__weakref__')
+
+  def __init__(self, fun, dyn_vars, var_refs, rng_refs, donate_argnums, transform):
+    self.fun = fun
+    self.dyn_vars = dyn_vars
+    self.var_refs = var_refs
+    self.rng_refs = rng_refs
+    self.donate_argnums = donate_argnums
+    self.transform = transform
+
+
+# "value" also registers the variable into the enclosing variable stacks
+_get_value = operator.attrgetter('value')
+# the getter and setter of the "_value" slot of Variable
+_raw_value = Variable._value.__get__
+_set_value = Variable._value.__set__
+
+
+def _assign_values(variables, values):
+  # iterate in C, rather than a Python loop over thousands of variables
+  deque(map(_set_value, variables, values), maxlen=0)
+
+
+def _split_stack(stack):
+  # the variables and the random states in a fixed order, which
+  # avoids the dict iterations on every call of the jitted function
+  variables = tuple(stack.values())
+  rng_type = _get_rng_type()
+  rngs = tuple(v for v in variables if isinstance(v, rng_type))
+  return variables, rngs
+
+
+def _check_donated_buffers(variable_data, args, kwargs, donate_argnums):
+  # the buffer of a donated argument cannot be donated twice
+  donated = set()
+  for i in donate_argnums:
+    if 0 < i <= len(args):
+      for leaf in jax.tree_util.tree_leaves(args[i - 1]):
+        if id(leaf) in donated:
+          raise ValueError(f'The buffer of the donated argument {i - 1} is donated more than once. '
+                           f'Please do not pass the same array to several donated arguments.')
+        donated.add(id(leaf))
+  if donate_argnums[0] != 0:
+    return variable_data
+  # A donated variable buffer is deleted by XLA, so that it cannot be shared
+  # with any argument (donated or not), or with another variable.
+  ids = set(map(id, jax.tree_util.tree_leaves((args, kwargs))))
+  num = len(ids)
+  ids.update(map(id, variable_data))
+  if len(ids) == num + len(variable_data):
+    return variable_data
+  ids = set(map(id, jax.tree_util.tree_leaves((args, kwargs))))
+  new_data = []
+  for data in variable_data:
+    if id(data) in ids:
+      data = jnp.copy(data)
+    ids.add(id(data))
+    new_data.append(data)
+  return tuple(new_data)
+
+
+def _jit_call_take_care_of_rngs(transform, variables, rngs, donate_argnums, *args, **kwargs):
   # call the transformed function
-  rng_keys = stack.call_on_subset(_is_rng, _rng_split_key)
-  changes, out = transform(stack.dict_data(), *args, **kwargs)
-  for key, v in changes.items():
-    stack[key]._value = v
-  for key, v in rng_keys.items():
-    stack[key]._value = v
+  rng_keys = tuple(rng.split_key() for rng in rngs)
+  variable_data = tuple(map(_get_value, variables))
+  if donate_argnums:
+    variable_data = _check_donated_buffers(variable_data, args, kwargs, donate_argnums)
+  changes, out = transform(variable_data, *args, **kwargs)
+  _assign_values(variables, changes)
+  _assign_values(rngs, rng_keys)
   return out
 
 
@@ -114,6 +246,7 @@ class JITTransform(ObjectTransform):
       name: Optional[str] = None,
       in_shardings: Any = None,
       out_shardings: Any = None,
+      donate_variables: bool = False,
 
       # deprecated
       dyn_vars: Dict[str, Variable] = None,
@@ -135,7 +268,12 @@ class JITTransform(ObjectTransform):
     # parameters
     self._static_argnums = _seq_of_int(static_argnums)
     self._static_argnames = _seq_of_str(static_argnames)
+    # static arguments of the transformed function, with argnums
+    # shifted by the variable data, its first argument
+    static_argnums, self._jit_static_argnames = _resolve_static_args(fun, self._static_argnums, self._static_argnames)
+    self._jit_static_argnums = tuple(a + 1 for a in static_argnums)
     self._donate_argnums = donate_argnums
+    self._donate_variables = donate_variables
     self._inline = inline
     self._keep_unused = keep_unused
     self._abstracted_axes = abstracted_axes
@@ -145,72 +283,107 @@ class JITTransform(ObjectTransform):
     # OO transformation parameters
     self._transform = None
     self._dyn_vars = None
-  #
-  # def _transform_function(self, variable_data: Dict, *args, **kwargs):
-  #   for key, v in self._dyn_vars.items():
-  #     v._value = variable_data[key]
-  #   out = self.fun(*args, **kwargs)
-  #   changes = self._dyn_vars.dict_data_of_subset(_is_not_rng)
-  #   return changes, out
+    self._var_refs = ()
+    self._rng_refs = ()
+    self._jit_donate_argnums = ()
+    self._init_lock = threading.RLock()
+
+    # the compiled function is shared with the other transformations
+    # of the same function and with the same parameters
+    self._compiled = None
+    self._cache_key = None
+    if dyn_vars is None and child_objs is None and in_shardings is None and out_shardings is None:
+      key = (_fun_id(fun), tuple(self._static_argnums), tuple(self._static_argnames),
+             tuple(_seq_of_int(donate_argnums)), inline, keep_unused, abstracted_axes, donate_variables)
+      try:
+        hash(key)
+      except TypeError:  # unhashable parameters
+        pass
+      else:
+        self._cache_key = key
+
+  def _load_compiled(self) -> bool:
+    compiled = None if self._cache_key is None else _jit_cache.get(self._cache_key)
+    if compiled is None:
+      return False
+    self._compiled = compiled
+    self._dyn_vars = compiled.dyn_vars
+    self._var_refs = compiled.var_refs
+    self._rng_refs = compiled.rng_refs
+    self._jit_donate_argnums = compiled.donate_argnums
+    self._transform = compiled.transform
+    return True
 
   def _get_transform(self, *args, **kwargs):
-    with VariableStack() as self._dyn_vars:
-      rets = eval_shape(self.fun,
-                        *args,
-                        **kwargs,
-                        static_argnums=self._static_argnums,
-                        static_argnames=self._static_argnames)
-      # in_shardings
-      if self._in_shardings is None:
-        in_shardings = None
+    if VariableStack.is_first_stack() and touch_no_variable(self.fun, args, kwargs):
+      # a pure function, no need to evaluate it for collecting variables
+      self._dyn_vars = VariableStack()
+      rets = None
+    else:
+      with VariableStack() as self._dyn_vars:
+        rets = eval_shape(self.fun,
+                          *args,
+                          **kwargs,
+                          static_argnums=self._static_argnums,
+                          static_argnames=self._static_argnames)
+    self._var_refs, self._rng_refs = _split_stack(self._dyn_vars)
+    # in_shardings
+    if self._in_shardings is None:
+      in_shardings = None
+    else:
+      if isinstance(self._in_shardings, (tuple, list)):
+        in_shardings = tuple(self._in_shardings)
       else:
-        if isinstance(self._in_shardings, (tuple, list)):
-          in_shardings = tuple(self._in_shardings)
-        else:
-          in_shardings = (self._in_shardings,)
-        _dyn_vars_sharing = get_shardings(self._dyn_vars)
-        in_shardings = (_dyn_vars_sharing,) + in_shardings
-
-      # out_shardings
-      if self._out_shardings is None:
-        out_shardings = None
+        in_shardings = (self._in_shardings,)
+      _dyn_vars_sharing = get_shardings(self._var_refs)
+      in_shardings = (_dyn_vars_sharing,) + in_shardings
+
+    # out_shardings
+    if self._out_shardings is None:
+      out_shardings = None
+    else:
+      if isinstance(self._out_shardings, (tuple, list)):
+        out_shardings = tuple(self._out_shardings)
       else:
-        if isinstance(self._out_shardings, (tuple, list)):
-          out_shardings = tuple(self._out_shardings)
-        else:
-          out_shardings = (self._out_shardings,)
-        global RandomState
-        if RandomState is None:
-          from brainpy.math.random import RandomState
-        _dyn_vars_sharing = get_shardings(self._dyn_vars.subset_by_not_instance(RandomState))
-        out_shardings = (_dyn_vars_sharing,) + out_shardings
+        out_shardings = (self._out_shardings,)
+      _dyn_vars_sharing = get_shardings(self._var_refs)
+      out_shardings = (_dyn_vars_sharing,) + out_shardings
 
     # jit
+    self._jit_donate_argnums = _get_donate_argnums(self._donate_argnums, self._donate_variables)
     self._transform = jax.jit(
-      _make_transform(self.fun, self._dyn_vars),
-      static_argnums=jax.tree_util.tree_map(lambda a: a + 1, self._static_argnums),
-      static_argnames=self._static_argnames,
-      donate_argnums=self._donate_argnums,
+      _make_transform(self.fun, self._var_refs),
+      static_argnums=self._jit_static_argnums,
+      static_argnames=self._jit_static_argnames,
+      donate_argnums=self._jit_donate_argnums,
       inline=self._inline,
       keep_unused=self._keep_unused,
       abstracted_axes=self._abstracted_axes,
       in_shardings=in_shardings,
       out_shardings=out_shardings,
     )
+    if self._cache_key is not None:
+      self._compiled = _Compiled(self.fun, self._dyn_vars, self._var_refs, self._rng_refs,
+                                 self._jit_donate_argnums, self._transform)
+      _jit_cache[self._cache_key] = self._compiled
     return rets
 
   def __call__(self, *args, **kwargs):
-    if jax.config.jax_disable_jit:  # support to disable JIT for debugging
-      return self.fun(*args, **kwargs)
-
     if self._transform is None:  # initialize the transformation
-      rets = self._get_transform(*args, **kwargs)
-      # if not the outermost transformation
-      if not self._dyn_vars.is_first_stack():
-        return rets
-
-    # call the transformed function
-    return _jit_call_take_care_of_rngs(self._transform, self._dyn_vars, *args, **kwargs)
+      if jax.config.jax_disable_jit:  # support to disable JIT for debugging
+        return self.fun(*args, **kwargs)
+      # only one thread traces the function, the others wait for its transformation
+      with self._init_lock:
+        if self._transform is None and not self._load_compiled():
+          rets = self._get_transform(*args, **kwargs)
+          # if not the outermost transformation
+          if not self._dyn_vars.is_first_stack():
+            return rets
+
+    # call the transformed function, which is
+    # called eagerly by JAX when JIT is disabled
+    return _jit_call_take_care_of_rngs(self._transform, self._var_refs, self._rng_refs,
+                                       self._jit_donate_argnums, *args, **kwargs)
 
   def __repr__(self):
     name = self.__class__.__name__
@@ -257,6 +430,21 @@ _jit_par = '''
     will raise an error if you try to. By default, no argument buffers are
     donated. Note that donate_argnums only work for positional arguments, and keyword
     arguments will not be donated.
+  donate_variables: bool
+    Whether to donate the buffers of the :py:class:`~.Variable` used in the function.
+    All variables are updated with the outputs of the computation, so XLA can reuse
+    their old buffers to store the new values. Default False. Do not keep references
+    to ``Variable.value`` across the jitted call if donation is enabled, since the
+    donated buffers are deleted after the call. Donation has no effect on CPU.
+  persistent_cache_dir: optional, str
+    The directory of the persistent compilation cache. If provided, the compiled
+    executables are saved to and loaded from this directory, so that other processes
+    running the same program can skip the XLA compilation. The function is still
+    traced once in every process. The cache directory can also be set by the
+    environment variable ``BRAINPY_JIT_CACHE_DIR``. There is only one cache directory
+    per process, so that a different directory requested later is ignored with a warning.
+    Which executables are persisted follows the JAX settings, e.g.
+    ``jax_persistent_cache_min_compile_time_secs``.
   device: optional, Any
     This is an experimental feature and the API is likely to change.
     Optional, the Device the jitted function will run on. (Available devices
@@ -289,6 +477,8 @@ def jit(
     inline: bool = False,
     keep_unused: bool = False,
     abstracted_axes: Optional[Any] = None,
+    donate_variables: bool = False,
+    persistent_cache_dir: Optional[str] = None,
 
     # deprecated
     dyn_vars: Optional[Union[Variable, Sequence[Variable], Dict[str, Variable]]] = None,
@@ -352,6 +542,8 @@ def jit(
 
   dynvar_deprecation(dyn_vars)
   node_deprecation(child_objs)
+  if persistent_cache_dir is not None:
+    _set_persistent_cache_dir(persistent_cache_dir)
   if dyn_vars is not None:
     dyn_vars = check.is_all_vars(dyn_vars, out_as='dict')
   if child_objs is not None:
@@ -367,6 +559,7 @@ def jit(
                                   inline=inline,
                                   keep_unused=keep_unused,
                                   abstracted_axes=abstracted_axes,
+                                  donate_variables=donate_variables,
                                   **kwargs)
   else:
     return JITTransform(fun=func,
@@ -378,6 +571,7 @@ def jit(
                         inline=inline,
                         keep_unused=keep_unused,
                         abstracted_axes=abstracted_axes,
+                        donate_variables=donate_variables,
                         **kwargs)
 
 
@@ -391,6 +585,7 @@ def cls_jit(
     inline: bool = False,
     keep_unused: bool = False,
     abstracted_axes: Optional[Any] = None,
+    persistent_cache_dir: Optional[str] = None,
     **kwargs
 ) -> Callable:
   """Just-in-time compile a function and then the jitted function as the bound method for a class.
@@ -418,6 +613,9 @@ def cls_jit(
   >>> program = SomeProgram()
   >>> program()
 
+  The positions in ``static_argnums`` and ``donate_argnums`` do not count ``self``,
+  i.e., ``0`` refers to the first argument after ``self``.
+
   Parameters
   ----------
   {jit_pars}
@@ -427,6 +625,8 @@ def cls_jit(
   func : JITTransform
     A callable jitted function, set up for just-in-time compilation.
   """
+  if persistent_cache_dir is not None:
+    _set_persistent_cache_dir(persistent_cache_dir)
   if func is None:
     return lambda f: _make_jit_fun(fun=f,
                                    static_argnums=static_argnums,
@@ -456,49 +656,101 @@ def _make_jit_fun(
     inline: bool = False,
     keep_unused: bool = False,
     abstracted_axes: Optional[Any] = None,
+    donate_variables: bool = False,
     **jit_kwargs
 ):
   static_argnums = _seq_of_int(static_argnums)
-  static_argnames = _seq_of_int(static_argnames)
+  static_argnames = _seq_of_str(static_argnames)
+  jit_static_argnums, jit_static_argnames = _resolve_static_args(fun, static_argnums, static_argnames, skip_first=True)
+  jit_static_argnums = tuple(a + 1 for a in jit_static_argnums)
+  donate_argnums = jit_kwargs.pop('donate_argnums', ())
+  init_locks = dict()  # the lock of tracing the function for each object
+  locks_lock = threading.Lock()
+
+  def _remove_cache(cache_key):
+    remove_stack_cache(cache_key)
+    init_locks.pop(cache_key, None)
+
+  def _get_init_lock(self, cache_key):
+    with locks_lock:
+      init_lock = init_locks.get(cache_key)
+      if init_lock is None:
+        init_lock = init_locks[cache_key] = threading.RLock()
+        try:
+          # drop the cache once the object is garbage collected
+          weakref.finalize(self, _remove_cache, cache_key)
+        except TypeError:  # the object does not support weak references
+          pass
+      return init_lock
 
   @wraps(fun)
   def call_fun(self, *args, **kwargs):
-    if jax.config.jax_disable_jit:
-      return fun(self, *args, **kwargs)
-
-    hash_v = hash(fun) + hash(self)
-    cache = get_stack_cache(hash_v)  # TODO: better cache mechanism
+    cache_key = (id(fun), id(self))
+    cache = get_stack_cache(cache_key)
     if cache is None:
-      fun2 = partial(fun, self)
-      with VariableStack() as stack:
-        out = eval_shape(fun2, *args, **kwargs, static_argnums=static_argnums, static_argnames=static_argnames)
-      _transform = jax.jit(
-        _make_transform(fun2, stack),
-        static_argnums=jax.tree_util.tree_map(lambda a: a + 1, static_argnums),
-        static_argnames=static_argnames,
-        device=device,
-        inline=inline,
-        keep_unused=keep_unused,
-        abstracted_axes=abstracted_axes,
-        **jit_kwargs
-      )
-      cache_stack(hash_v, (stack, _transform))  # cache "variable stack" and "transform function"
-      if not stack.is_first_stack():
-        return out
-    else:
-      stack, _transform = cache
-    return _jit_call_take_care_of_rngs(_transform, stack, *args, **kwargs)
+      if jax.config.jax_disable_jit:
+        return fun(self, *args, **kwargs)
+      # only one thread traces the function of an object, the others wait for its transformation
+      with _get_init_lock(self, cache_key):
+        cache = get_stack_cache(cache_key)
+        if cache is None:
+          try:
+            self_ref = weakref.ref(self)
+          except TypeError:  # the object does not support weak references
+            fun2 = partial(fun, self)
+          else:
+            # do not keep the object alive through its transformation
+            fun2 = _weak_method(fun, self_ref)
+          with VariableStack() as stack:
+            out = eval_shape(fun2, *args, **kwargs, static_argnums=static_argnums, static_argnames=static_argnames)
+          variables, rngs = _split_stack(stack)
+          jit_donate_argnums = _get_donate_argnums(donate_argnums, donate_variables)
+          if device is not None and stack.is_first_stack():
+            # commit the variables to the device once, rather than transferring them on every call
+            _assign_values(variables, [jax.device_put(v.value, device) for v in variables])
+          _transform = jax.jit(
+            _make_transform(fun2, variables),
+            static_argnums=jit_static_argnums,
+            static_argnames=jit_static_argnames,
+            donate_argnums=jit_donate_argnums,
+            device=device,
+            inline=inline,
+            keep_unused=keep_unused,
+            abstracted_axes=abstracted_axes,
+            **jit_kwargs
+          )
+          cache = (variables, rngs, jit_donate_argnums, _transform)
+          cache_stack(cache_key, cache)  # cache "variables" and "transform function"
+          if not stack.is_first_stack():
+            return out
+    variables, rngs, jit_donate_argnums, _transform = cache
+    return _jit_call_take_care_of_rngs(_transform, variables, rngs, jit_donate_argnums, *args, **kwargs)
 
   return call_fun
 
 
-def _make_transform(fun, stack):
+def _weak_method(fun, self_ref):
+  @wraps(fun)
+  def method(*args, **kwargs):
+    return fun(self_ref(), *args, **kwargs)
+
+  return method
+
+
+def _make_transform(fun, variables: Tuple[Variable, ...]):
   @wraps(fun)
-  def _transform_function(variable_data: Dict, *args, **kwargs):
-    for key, v in stack.items():
-      v._value = variable_data[key]
-    out = fun(*args, **kwargs)
-    changes = stack.dict_data_of_subset(_is_not_rng)
+  def _transform_function(variable_data: Tuple, *args, **kwargs):
+    old_data = tuple(map(_raw_value, variables))
+    _assign_values(variables, variable_data)
+    try:
+      out = fun(*args, **kwargs)
+    except BaseException:
+      # do not leave the traced values in the variables
+      _assign_values(variables, old_data)
+      raise
+    # keep the same structure and order as "variable_data", so that
+    # each output buffer can be aliased to its input buffer
+    changes = tuple(map(_get_value, variables))
     return changes, out
 
   return _transform_function
@@ -56,6 +56,11 @@ def cache_stack(func, stack):
   _fun2stack[func] = stack
 
 
+def remove_stack_cache(func):
+  """Remove the cached stack of the given function."""
+  _fun2stack.pop(func, None)
+
+
 def clear_stack_cache():
   """Clear the cached stack."""
   for k in tuple(_fun2stack.keys()):
@@ -68,3 +73,21 @@ def get_stack_cache(func):
   else:
     return None
 
+
+
+_topology_version = 0
+
+
+def get_topology_version():
+  """Get the version of the object topology."""
+  return _topology_version
+
+
+def bump_topology_version():
+  """Increase the version of the object topology.
+
+  It should be called once a node or a variable is (un)registered, so that
+  the cached results of ``.nodes()`` and ``.vars()`` are invalidated.
+  """
+  global _topology_version
+  _topology_version += 1
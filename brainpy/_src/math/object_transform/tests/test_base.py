@@ -39,6 +39,59 @@ class TestCollectionFunction(unittest.TestCase):
     self.assertTrue(len(net.nodes(level=3)) == (1 + 2 + 4 + 8))
     self.assertTrue(len(net.nodes(level=3, include_self=False)) == (2 + 4 + 8))
 
+  def test_f_nodes_shared_child(self):
+    class C(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.var = bm.Variable(bm.zeros(1))
+
+    class B(bp.BrainPyObject):
+      def __init__(self, child):
+        super().__init__()
+        self.child = child
+
+    class A(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        c = C()
+        self.b1 = B(c)
+        self.b2 = B(c)
+
+    a = A()
+    self.assertTrue(len(a.nodes()) == 4)
+    # the shared child is collected under the path from each parent
+    self.assertTrue(len(a.nodes(method='relative')) == 5)
+    self.assertTrue(len(a.vars(method='relative')) == 2)
+    self.assertTrue('b1.child' in a.nodes(method='relative'))
+    self.assertTrue('b2.child' in a.nodes(method='relative'))
+    self.assertTrue(len(a.nodes(method='relative', unique=True)) == 4)
+    self.assertTrue(len(a.nodes(unique=True)) == 4)
+
+  def test_f_nodes_shared_child_with_level(self):
+    class Leaf(bp.BrainPyObject):
+      pass
+
+    class Wrap(bp.BrainPyObject):
+      def __init__(self, child):
+        super().__init__()
+        self.child = child
+
+    leaf = Leaf()
+    shared = Wrap(leaf)
+    # "shared" is found at the level 3 along the first path,
+    # and at the level 2 along the second one
+    a = bp.BrainPyObject()
+    a.first = Wrap(Wrap(shared))
+    a.second = Wrap(shared)
+    nodes = a.nodes(level=3)
+    self.assertTrue(shared.name in nodes)
+    self.assertTrue(leaf.name in nodes)
+    self.assertTrue(len(a.nodes(level=3, method='relative')) == 7)
+    nodes = a.nodes(level=3, unique=True)
+    self.assertTrue(shared.name in nodes)
+    self.assertTrue(leaf.name in nodes)
+    self.assertTrue(len(a.nodes(level=3, method='relative', unique=True)) == 6)
+
   def test_f_vars(self):
     class C(bp.DynamicalSystem):
       def __init__(self):
@@ -78,6 +131,106 @@ class TestCollectionFunction(unittest.TestCase):
     self.assertTrue(len(net.vars(level=3)) == (2 + 4 + 8) * 2)
     self.assertTrue(len(net.vars(level=3, include_self=False)) == (2 + 4 + 8) * 2)
 
+  def test_f_vars_after_setting_attributes(self):
+    class A(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.var1 = bm.Variable(bm.zeros(1))
+
+    a = A()
+    self.assertTrue(len(a.vars()) == 1)
+    a.var2 = bm.Variable(bm.zeros(1))
+    self.assertTrue(len(a.vars()) == 2)
+    a.tracing_variable('var3', bm.zeros, (1,))
+    self.assertTrue(len(a.vars()) == 3)
+    del a.var1
+    self.assertTrue(len(a.vars()) == 2)
+
+  def test_f_vars_cache_of_children(self):
+    class B(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.var = bm.Variable(bm.zeros(1))
+
+    class A(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.b = B()
+        self.bs = bm.NodeList([])
+
+    a = A()
+    self.assertTrue(len(a.vars()) == 1)
+    a.vars().clear()  # the returned collection is a copy
+    self.assertTrue(len(a.vars()) == 1)
+    a.b.var2 = bm.Variable(bm.zeros(1))
+    self.assertTrue(len(a.vars()) == 2)
+    a.bs.append(B())
+    self.assertTrue(len(a.nodes()) == 3)
+    self.assertTrue(len(a.vars()) == 3)
+    a.b.register_implicit_vars(bm.Variable(bm.zeros(1)))
+    self.assertTrue(len(a.vars()) == 4)
+
+  def test_f_vars_cache_of_containers(self):
+    class B(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.var = bm.Variable(bm.zeros(1))
+
+    class A(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.bs = bm.NodeList([B(), B()])
+        self.bd = bm.NodeDict(x=B())
+        self.vs = bm.VarList([bm.Variable(bm.zeros(1))])
+        self.vd = bm.VarDict(x=bm.Variable(bm.zeros(1)))
+
+    a = A()
+    self.assertTrue(len(a.vars()) == 5)
+    a.bs.pop()
+    self.assertTrue(len(a.vars()) == 4)
+    a.bs.insert(0, B())
+    a.bs += [B()]
+    self.assertTrue(len(a.vars()) == 6)
+    a.bs[0] = B()
+    self.assertTrue(any(v is a.bs[0].var for v in a.vars().values()))
+    del a.bs[0]
+    a.bs.clear()
+    self.assertTrue(len(a.vars()) == 3)
+    a.bd.pop('x')
+    self.assertTrue(len(a.nodes()) == 1)
+    a.bd.setdefault('y', B())
+    self.assertTrue(len(a.nodes()) == 2)
+    del a.bd['y']
+    a.vs.pop()
+    a.vd.clear()
+    self.assertTrue(len(a.vars()) == 0)
+    a.vd.setdefault('z', bm.Variable(bm.zeros(1)))
+    a.vs.insert(0, bm.Variable(bm.zeros(1)))
+    self.assertTrue(len(a.vars()) == 2)
+
+
+  def test_f_vars_cache_of_copies(self):
+    import copy
+
+    class A(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.var = bm.Variable(bm.zeros(1))
+
+    a = A()
+    self.assertTrue(a.nodes(method='relative')[''] is a)
+    self.assertTrue(len(a.vars()) == 1)
+
+    b = copy.copy(a)
+    c = copy.deepcopy(a)
+    for obj in (b, c):
+      self.assertFalse(any(k in obj.__dict__ for k in ('_topology_cache', '_var_attr_names')))
+    self.assertTrue(b.nodes(method='relative')[''] is b)
+    self.assertTrue(c.nodes(method='relative')[''] is c)
+    self.assertTrue(all(v is c.var for v in c.vars().values()))
+    # the state used by "pickle"
+    self.assertFalse(any(k in a.__getstate__() for k in ('_topology_cache', '_var_attr_names')))
+
 
 class TestNodeList(unittest.TestCase):
   def test_NodeList_1(self):
@@ -166,6 +319,16 @@ class TestNodeDict(unittest.TestCase):
             obj.nodes(method='relative').keys())
       # print(jax.tree_util.tree_structure(obj))
 
+  def test_NodeDict_check_unique(self):
+    l1 = bp.layers.Activation(bm.tanh)
+    l2 = bp.layers.Activation(bm.relu)
+    ls = bm.NodeDict({'l1': l1}, check_unique=True)
+    ls['l1'] = l1
+    ls['l2'] = l2
+    self.assertTrue(ls['l2'] is l2)
+    with self.assertRaises(KeyError):
+      ls['l1'] = l2
+
 
 class TestVarList(unittest.TestCase):
   def test_ListVar_1(self):
@@ -199,6 +362,12 @@ class TestVarList(unittest.TestCase):
 
 
 class TestVarDict(unittest.TestCase):
+  def test_update_with_pair(self):
+    a, b = bm.Variable(1.), bm.Variable(2.)
+    d = bm.VarDict(('a', a), ('b', b))
+    self.assertTrue(d['a'] is a)
+    self.assertTrue(d['b'] is b)
+
   def test_DictVar_1(self):
     bm.random.seed()
 
@@ -289,6 +458,16 @@ class TestStateSavingAndLoading(unittest.TestCase):
       obj.load_state_dict(random_state)
       jax.tree_map(all_close, random_state, variables, is_leaf=bm.is_bp_array)
 
+  def test_load_states_v1_keys(self):
+    class Object(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.a = bm.Variable(bm.zeros(1))
+        self.b = bm.Variable(bm.zeros(1))
 
-
-
+    obj = Object()
+    for _ in range(2):
+      r = obj.load_state_dict({f'{obj.name}.a': bm.ones(1), 'c': bm.ones(1)}, warn=False, compatible='v1')
+      self.assertEqual(r.unexpected_keys, ['c'])
+      self.assertEqual(r.missing_keys, [f'{obj.name}.b'])
+      self.assertTrue(bm.allclose(obj.a, 1.))
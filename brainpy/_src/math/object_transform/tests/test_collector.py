@@ -287,3 +287,24 @@ def test_hidden_variables():
   print(model.vars(level=-1).keys())
   assert len(model.vars(level=-1)) == 1
 
+
+
+def test_replace_keeps_order():
+  a, b, c = bp.math.Variable(1.), bp.math.Variable(2.), bp.math.Variable(3.)
+  collector = bp.ArrayCollector(a=a, b=b)
+  collector.replace('a', c)
+  assert list(collector.keys()) == ['a', 'b']
+  assert collector['a'] is c
+  try:
+    collector.replace('d', c)
+  except KeyError:
+    pass
+  else:
+    raise AssertionError('replacing a missing key should fail')
+  try:
+    collector.replace('a', 1.)
+  except AssertionError:
+    pass
+  else:
+    raise AssertionError('an ArrayCollector only contains Variable')
+  assert collector['a'] is c
@@ -3,8 +3,10 @@
 
 import jax
 import tempfile
+import warnings
 
 import unittest
+from unittest import mock
 import brainpy as bp
 import brainpy.math as bm
 
@@ -68,6 +70,162 @@ class TestJIT(unittest.TestCase):
     f2(2., c=1.)
     self.assertTrue(bm.allclose(a.value, 1.))
 
+  def test_jit_donate_variables(self):
+    for donate in [True, False]:
+      a = bm.Variable(bm.ones(2))
+
+      @bm.jit(donate_variables=donate)
+      def f(b):
+        a.value += b
+        return a.value * 2.
+
+      for _ in range(3):
+        out = f(1.)
+      self.assertTrue(bm.allclose(a.value, 4.))
+      self.assertTrue(bm.allclose(out, 8.))
+
+  def test_jit_donate_variables_forced(self):
+    # buffer donation is disabled on CPU, force it to test the donation path
+    from brainpy._src.math.object_transform import jit as jit_module
+
+    with mock.patch.object(jit_module, '_support_donation', return_value=True), warnings.catch_warnings():
+      warnings.simplefilter('ignore')  # XLA warns the unusable donated buffers on CPU
+      a = bm.Variable(bm.ones(2))
+
+      @bm.jit(donate_variables=True)
+      def f(x):
+        a.value += x
+        return a.value * 2.
+
+      for _ in range(3):
+        out = f(1.)
+      self.assertTrue(f._jit_donate_argnums[0] == 0)
+      self.assertTrue(bm.allclose(a.value, 4.))
+      self.assertTrue(bm.allclose(out, 8.))
+
+      # the variable is aliased as an argument
+      @bm.jit(donate_variables=True)
+      def g(x):
+        a.value += x
+        return a.value
+
+      for _ in range(3):
+        x = a.value
+        out = g(x)
+      self.assertTrue(g._jit_donate_argnums[0] == 0)
+      self.assertTrue(bm.allclose(x, 16.))
+      self.assertTrue(bm.allclose(a.value, 32.))
+      self.assertTrue(bm.allclose(out, 32.))
+      out = g(a)
+      self.assertTrue(bm.allclose(a.value, 64.))
+      self.assertTrue(bm.allclose(out, 64.))
+
+      # variables are not donated by default
+      @bm.jit
+      def h(x):
+        a.value += x
+        return a.value
+
+      h(1.)
+      self.assertTrue(h._jit_donate_argnums == ())
+
+  def test_jit_pure_function(self):
+    import jax.numpy as jnp
+
+    @bm.jit
+    def selu(x, alpha=1.67, lmbda=1.05):
+      return lmbda * jnp.where(x > 0, x, alpha * jnp.exp(x) - alpha)
+
+    self.assertTrue(bm.allclose(selu(bm.ones(3)), 1.05))
+    self.assertTrue(len(selu._dyn_vars) == 0)
+
+    a = bm.Variable(bm.ones(2))
+
+    @bm.jit
+    def f(x):
+      a.value += x
+      return jnp.sum(a.value)
+
+    self.assertTrue(bm.allclose(f(1.), 4.))
+    self.assertTrue(len(f._dyn_vars) == 1)
+
+  def test_jit_duplicate_donation(self):
+    @bm.jit(donate_argnums=(0, 1))
+    def f(a, b):
+      return a + b
+
+    x = bm.ones(3)
+    with self.assertRaises(ValueError):
+      f(x, x)
+
+  def test_jit_donated_variable_as_argument(self):
+    from brainpy._src.math.object_transform.jit import _check_donated_buffers
+
+    x = bm.ones(2).value
+    y = bm.zeros(2).value
+    # the variable buffer passed as a non-donated argument
+    data = _check_donated_buffers((x, y), (x,), {}, (0,))
+    self.assertIsNot(data[0], x)
+    self.assertIs(data[1], y)
+    data = _check_donated_buffers((x, y), (), {'b': [y]}, (0,))
+    self.assertIs(data[0], x)
+    self.assertIsNot(data[1], y)
+    # two variables share one buffer
+    data = _check_donated_buffers((x, x), (), {}, (0,))
+    self.assertIsNot(data[0], data[1])
+    # variables are not donated
+    data = _check_donated_buffers((x, y), (x,), {}, (1,))
+    self.assertIs(data[0], x)
+
+  def test_jit_cache_of_same_function(self):
+    class SomeProgram(bp.BrainPyObject):
+      def __init__(self):
+        super(SomeProgram, self).__init__()
+        self.b = bm.Variable(bm.ones(2))
+
+      def update(self, x):
+        self.b += x
+        return self.b.value
+
+    program = SomeProgram()
+    f1 = bm.jit(program.update)
+    f2 = bm.jit(program.update)
+    f3 = bm.jit(program.update, inline=True)
+    f4 = bm.jit(SomeProgram().update)
+    # each call of "jit" gives a new transformation ...
+    self.assertIsNot(f1, f2)
+    self.assertNotEqual(f1.name, f2.name)
+    f1(1.)
+    f2(1.)
+    f3(1.)
+    f4(1.)
+    self.assertTrue(bm.allclose(program.b, 4.))
+    # ... but the compiled function of the same function is shared
+    self.assertIs(f1._transform, f2._transform)
+    self.assertIsNot(f1._transform, f3._transform)
+    self.assertIsNot(f1._transform, f4._transform)
+
+
+  def test_jit_persistent_cache_dir(self):
+    from brainpy._src.math.object_transform.jit import _set_persistent_cache_dir
+
+    old = jax.config.jax_compilation_cache_dir
+    old_time = jax.config.jax_persistent_cache_min_compile_time_secs
+    try:
+      jax.config.update('jax_compilation_cache_dir', None)
+      with tempfile.TemporaryDirectory() as d1, tempfile.TemporaryDirectory() as d2:
+        _set_persistent_cache_dir(d1)
+        self.assertEqual(jax.config.jax_compilation_cache_dir, d1)
+        with warnings.catch_warnings():
+          warnings.simplefilter('error')
+          _set_persistent_cache_dir(d1)
+        with self.assertWarns(UserWarning):
+          _set_persistent_cache_dir(d2)
+        self.assertEqual(jax.config.jax_compilation_cache_dir, d1)
+      self.assertEqual(jax.config.jax_persistent_cache_min_compile_time_secs, old_time)
+    finally:
+      jax.config.update('jax_compilation_cache_dir', old)
+
 
 class TestClsJIT(unittest.TestCase):
 
@@ -180,6 +338,60 @@ class TestClsJIT(unittest.TestCase):
     self.assertTrue(bm.allclose(obj.a.value, 0.5))
 
 
+  def test_cls_jit_donate_argnums(self):
+    from brainpy._src.math.object_transform.naming import get_stack_cache
+
+    class MyObj:
+      def __init__(self):
+        self.a = bm.Variable(bm.ones(2))
+
+      # "self" is not counted in "donate_argnums"
+      @bm.cls_jit(donate_argnums=(0, 1))
+      def f(self, b, c):
+        self.a.value += b + c
+        return self.a.value
+
+    obj = MyObj()
+    x = bm.ones(2).value
+    with warnings.catch_warnings():
+      warnings.simplefilter('ignore')  # XLA warns the unusable donated buffers on CPU
+      obj.f(bm.ones(2).value, bm.zeros(2).value)
+    self.assertTrue(bm.allclose(obj.a.value, 2.))
+    # the transformed function receives the variable data as its first argument
+    cache = get_stack_cache((id(MyObj.f.__wrapped__), id(obj)))
+    self.assertTupleEqual(cache[2], (1, 2))
+    with self.assertRaises(ValueError):
+      obj.f(x, x)
+
+  def test_cls_jit_cache_removed_with_object(self):
+    import gc
+    import weakref
+    from brainpy._src.math.object_transform.naming import get_stack_cache, remove_stack_cache
+
+    class MyObj:
+      def __init__(self):
+        self.a = bm.Variable(bm.ones(2))
+
+      @bm.cls_jit
+      def f(self, b):
+        self.a.value += b
+
+    obj = MyObj()
+    cache_key = (id(MyObj.f.__wrapped__), id(obj))
+    with mock.patch.object(weakref, 'finalize', wraps=weakref.finalize) as finalize:
+      obj.f(1.)
+      remove_stack_cache(cache_key)
+      obj.f(1.)
+      obj.f(1.)
+    # the finalizer is registered once for each object
+    self.assertEqual(finalize.call_count, 1)
+    self.assertTrue(bm.allclose(obj.a.value, 4.))
+    self.assertIsNotNone(get_stack_cache(cache_key))
+    del obj
+    gc.collect()
+    self.assertIsNone(get_stack_cache(cache_key))
+
+
 class TestDebug(unittest.TestCase):
   def test_debug1(self):
     a = bm.random.RandomState()
@@ -120,3 +120,69 @@ class TestTool(unittest.TestCase):
 
 
 
+
+  def test_partial_fun_with_array_static_args(self):
+    import numpy as np
+    from brainpy._src.math.object_transform.tools import _partial_fun
+
+    def f(a, b, c, d=1.):
+      return a * b + c * d
+
+    b = np.ones(3)
+    f2, args, kwargs = _partial_fun(f, (1., b, 2.), {'d': 3.}, static_argnums=(1,), static_argnames=('d',))
+    self.assertTrue(len(args) == 2)
+    self.assertTrue(len(kwargs) == 0)
+    self.assertTrue(np.allclose(f2(*args, **kwargs), f(1., b, 2., d=3.)))
+
+  def test_touch_no_variable(self):
+    import functools
+    import jax.numpy as jnp
+    from brainpy._src.math.object_transform.tools import touch_no_variable
+
+    class Model(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.a = bm.Variable(bm.ones(1))
+
+      def update(self, x):
+        self.a += x
+        return self.a.value
+
+    def selu(x, alpha=1.67, lmbda=1.05):
+      return lmbda * jnp.where(x > 0, x, alpha * jnp.exp(x) - alpha)
+
+    self.assertTrue(touch_no_variable(selu, (1.,)))
+    self.assertFalse(touch_no_variable(selu, (bm.Variable(bm.ones(1)),)))
+
+    model = Model()
+    for wrapped in (jax.tree_util.Partial(model.update),
+                    functools.partial(model.update),
+                    jax.named_call(model.update)):
+      def f(x):
+        return wrapped(x)
+
+      self.assertFalse(touch_no_variable(f, (1.,)))
+
+    # the variables held by the non-pytree arguments
+    for arg in (functools.partial(model.update), [model.update], 'static'):
+      self.assertFalse(touch_no_variable(selu, (arg,)))
+
+  def test_touch_no_variable_rebound_global(self):
+    from brainpy._src.math.object_transform.tools import touch_no_variable
+
+    namespace = {'model': None}
+    exec('def f(x):\n  return x if model is None else model.update(x)', namespace)
+    f = namespace['f']
+    self.assertTrue(touch_no_variable(f, (1.,)))
+
+    class Model(bp.BrainPyObject):
+      def __init__(self):
+        super().__init__()
+        self.a = bm.Variable(bm.ones(1))
+
+      def update(self, x):
+        self.a += x
+        return self.a.value
+
+    namespace['model'] = Model()
+    self.assertFalse(touch_no_variable(f, (1.,)))
@@ -1,21 +1,55 @@
+import numbers
+import threading
+import types
 import warnings
-from functools import wraps
+from functools import wraps, lru_cache, partial
 from typing import Sequence, Tuple, Any, Callable
 
 import jax
+import numpy as np
 
 from brainpy._src.math.object_transform.naming import (cache_stack,
                                                        get_stack_cache)
-from brainpy._src.math.object_transform.variables import VariableStack
+from brainpy._src.math.object_transform.base import BrainPyObject
+from brainpy._src.math.object_transform.variables import Variable, VariableStack
 
-fun_in_eval_shape = []
+# the nesting depth of "eval_shape()" in the current thread
+_eval_shape_depth = threading.local()
 
 
-class Empty(object):
-  pass
+def _depth() -> int:
+  return getattr(_eval_shape_depth, 'n', 0)
 
 
-empty = Empty()
+@lru_cache(maxsize=1024)
+def _static_arg_mask(num_args: int, static_argnums: Tuple[int, ...]) -> Tuple[bool, ...]:
+  # The partition of static and dynamic positions only depends on the number of
+  # arguments and ``static_argnums``, so it is shared by all functions.
+  return tuple(i in static_argnums for i in range(num_args))
+
+
+@lru_cache(maxsize=1024)
+def _make_splitter(num_args: int, static_argnums: Tuple[int, ...]) -> Tuple[Callable, Callable]:
+  """Generate the functions which split the arguments into the static and dynamic ones,
+  and merge them back, with the indexing unrolled for the given argument layout."""
+  static_mask = _static_arg_mask(num_args, static_argnums)
+  static_ids = [i for i, is_static in enumerate(static_mask) if is_static]
+  dyn_ids = [i for i, is_static in enumerate(static_mask) if not is_static]
+  merged_args = []
+  for i, is_static in enumerate(static_mask):
+    if is_static:
+      merged_args.append(f'static_args[{static_ids.index(i)}], ')
+    else:
+      merged_args.append(f'dyn_args[{dyn_ids.index(i)}], ')
+  source = (
+    f'def split(args):\n'
+    f'  return ({"".join(f"args[{i}], " for i in static_ids)}), [{"".join(f"args[{i}], " for i in dyn_ids)}]\n'
+    f'def merge(fun, static_args, static_kwargs, dyn_args, dyn_kwargs):\n'
+    f'  return fun({"".join(merged_args)}**static_kwargs, **dyn_kwargs)\n'
+  )
+  namespace = dict()
+  exec(compile(source, f'<partial function with {num_args} arguments>', 'exec'), namespace)
+  return namespace['split'], namespace['merge']
 
 
 def _partial_fun(
@@ -25,13 +59,8 @@ def _partial_fun(
     static_argnums: Sequence[int] = (),
     static_argnames: Sequence[str] = ()
 ):
-  static_args, dyn_args = [], []
-  for i, arg in enumerate(args):
-    if i in static_argnums:
-      static_args.append(arg)
-    else:
-      static_args.append(empty)
-      dyn_args.append(arg)
+  split, merge = _make_splitter(len(args), tuple(static_argnums))
+  static_args, dyn_args = split(args)
   static_kwargs, dyn_kwargs = {}, {}
   for k, arg in kwargs.items():
     if k in static_argnames:
@@ -42,19 +71,117 @@ def _partial_fun(
 
   @wraps(fun)
   def new_fun(*dynargs, **dynkwargs):
-    args = []
-    i = 0
-    for arg in static_args:
-      if arg == empty:
-        args.append(dynargs[i])
-        i += 1
-      else:
-        args.append(arg)
-    return fun(*args, **static_kwargs, **dynkwargs)
+    return merge(fun, static_args, static_kwargs, dynargs, dynkwargs)
 
   return new_fun, dyn_args, dyn_kwargs
 
 
+# the top-level packages whose objects never touch a Variable
+_safe_packages = ('builtins', 'math', 'numpy', 'jax', 'jaxlib')
+
+
+def _is_safe_module(module) -> bool:
+  return isinstance(module, str) and module.split('.')[0] in _safe_packages
+
+
+def _is_safe_object(obj, seen: set = None) -> bool:
+  # Only the objects which cannot hold a Variable are safe. The instances,
+  # wrappers and closures from the safe packages may still hold a user
+  # object, e.g., "jax.tree_util.Partial(model.update)", so that they are
+  # inspected, or are considered as unsafe.
+  if obj is None or isinstance(obj, (numbers.Number, str, bytes, np.generic, np.dtype, np.ufunc, jax.Array)):
+    return True
+  if isinstance(obj, np.ndarray):
+    return obj.dtype.kind != 'O'
+  if isinstance(obj, (Variable, BrainPyObject)):
+    return False
+  if isinstance(obj, types.ModuleType):
+    return _is_safe_module(obj.__name__)
+  if isinstance(obj, type):
+    return _is_safe_module(obj.__module__)
+  if isinstance(obj, types.BuiltinFunctionType):
+    # the builtin methods bound to an instance have no module
+    return _is_safe_module(obj.__module__)
+  if seen is None:
+    seen = set()
+  if id(obj) in seen:  # a recursive reference
+    return True
+  seen.add(id(obj))
+  if isinstance(obj, (tuple, list, set, frozenset)):
+    return all(_is_safe_object(o, seen) for o in obj)
+  if isinstance(obj, dict):
+    return all(_is_safe_object(o, seen) for o in obj.keys()) and \
+      all(_is_safe_object(o, seen) for o in obj.values())
+  if isinstance(obj, partial):  # including "jax.tree_util.Partial"
+    return (_is_safe_object(obj.func, seen) and
+            _is_safe_object(obj.args, seen) and
+            _is_safe_object(obj.keywords, seen))
+  if isinstance(obj, types.FunctionType):
+    # a function of the safe packages may wrap a user function
+    return _is_safe_module(obj.__module__) and _is_safe_object(_fun_objects(obj), seen)
+  if callable(obj) and _is_safe_module(getattr(type(obj), '__module__', None)):
+    # compiled wrappers of the safe packages, like the jitted functions of "jax.numpy"
+    wrapped = getattr(obj, '__wrapped__', None)
+    return (wrapped is not None and
+            _is_safe_module(getattr(obj, '__module__', None)) and
+            _is_safe_object(wrapped, seen))
+  return False
+
+
+def _fun_objects(fun: types.FunctionType) -> list:
+  # the objects referred by the defaults and the closure of a function
+  objects = list(fun.__defaults__ or ())
+  objects.extend((fun.__kwdefaults__ or {}).values())
+  for cell in fun.__closure__ or ():
+    try:
+      objects.append(cell.cell_contents)
+    except ValueError:  # the cell is not filled yet
+      objects.append(cell)  # not safe
+  return objects
+
+
+def _code_names(code: types.CodeType) -> set:
+  names = set(code.co_names)
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      names.update(_code_names(const))
+  return names
+
+
+def _fun_touch_no_variable(fun: types.FunctionType) -> bool:
+  # Nothing is cached, since the globals, closures and defaults can be rebound
+  # after the function is defined. This is only checked once per transformation.
+  objects = _fun_objects(fun)
+  objects.extend(fun.__globals__[name] for name in _code_names(fun.__code__) if name in fun.__globals__)
+  return _is_safe_object(objects)
+
+
+def _is_data_leaf(leaf) -> bool:
+  # An argument leaf which is not an array, a scalar or None may be any object
+  # (a static argument, a container, a partial function, etc.) holding a Variable.
+  if leaf is None or isinstance(leaf, (numbers.Number, np.generic, jax.Array)):
+    return True
+  return isinstance(leaf, np.ndarray) and leaf.dtype.kind != 'O'
+
+
+def touch_no_variable(fun: Callable, args: tuple = (), kwargs: dict = None) -> bool:
+  """Check whether the function touches no :py:class:`~.Variable` when calling with the given arguments.
+
+  The check is conservative: ``True`` is only returned for a Python function whose
+  globals, closures and defaults are all plain data, arrays, or modules, classes and
+  functions of ``numpy``, ``jax`` or the standard library (whose own closures and wrapped
+  functions are also checked), and whose arguments are all arrays, scalars or None.
+  """
+  if not isinstance(fun, types.FunctionType):
+    return False
+  # "Variable" is a pytree, which should not be flattened into its value
+  leaves = jax.tree_util.tree_leaves((args, kwargs),
+                                     is_leaf=lambda a: isinstance(a, (Variable, BrainPyObject)))
+  if not all(map(_is_data_leaf, leaves)):
+    return False
+  return _fun_touch_no_variable(fun)
+
+
 def dynvar_deprecation(dyn_vars=None):
   if dyn_vars is not None:
     warnings.warn('\n'
@@ -73,13 +200,6 @@ def node_deprecation(child_objs=None):
                   UserWarning)
 
 
-def abstract(x):
-  if callable(x):
-    return x
-  else:
-    return jax.api_util.shaped_abstractify(x)
-
-
 def evaluate_dyn_vars(
     f,
     *args,
@@ -142,21 +262,15 @@ def _partial_fun2(
   num_args = len(args)
 
   # arguments
-  static_args = dict()
-  dyn_args = []
-  dyn_arg_ids = dict()
-  static_argnums = list(static_argnums)
-  dyn_i = 0
-  for i in range(num_args):
-    if i in static_argnums:
-      static_argnums.remove(i)
-      static_args[i] = args[i]
-    else:
-      dyn_args.append(args[i])
-      dyn_arg_ids[i] = dyn_i
-      dyn_i += 1
-  if len(static_argnums) > 0:
-    raise ValueError(f"Invalid static_argnums: {static_argnums}")
+  static_mask = _static_arg_mask(num_args, tuple(static_argnums))
+  if sum(static_mask) != len(static_argnums):
+    invalid = list(static_argnums)
+    for i in range(num_args):
+      if i in invalid:
+        invalid.remove(i)
+    raise ValueError(f"Invalid static_argnums: {invalid}")
+  split, merge = _make_splitter(num_args, tuple(static_argnums))
+  static_args, dyn_args = split(args)
 
   # keyword arguments
   static_kwargs, dyn_kwargs = {}, {}
@@ -169,9 +283,7 @@ def _partial_fun2(
 
   @wraps(fun)
   def new_fun(*dynargs, **dynkwargs):
-    return fun(*[dynargs[dyn_arg_ids[id_]] if id_ in dyn_arg_ids else static_args[id_] for id_ in range(num_args)],
-               **static_kwargs,
-               **dynkwargs)
+    return merge(fun, static_args, static_kwargs, dynargs, dynkwargs)
 
   return new_fun, dyn_args, dyn_kwargs
 
@@ -204,22 +316,22 @@ def eval_shape(
     f2 = fun
 
   # evaluate the function
-  fun_in_eval_shape.append(fun)
+  _eval_shape_depth.n = _depth() + 1
   try:
     if with_stack:
       with VariableStack() as stack:
-        if len(fun_in_eval_shape) > 1:
+        if _eval_shape_depth.n > 1:
           returns = f2(*args, **kwargs)
         else:
           returns = jax.eval_shape(f2, *args, **kwargs)
     else:
       stack = None
-      if len(fun_in_eval_shape) > 1:
+      if _eval_shape_depth.n > 1:
         returns = f2(*args, **kwargs)
       else:
         returns = jax.eval_shape(f2, *args, **kwargs)
   finally:
-    fun_in_eval_shape.pop()
+    _eval_shape_depth.n -= 1
     del f2
   if with_stack:
     return stack, returns
@@ -7,6 +7,7 @@ from jax.dtypes import canonicalize_dtype
 from jax.tree_util import register_pytree_node_class
 
 from brainpy._src.math.ndarray import Array
+from brainpy._src.math.object_transform.naming import bump_topology_version
 from brainpy._src.math.sharding import BATCH_AXIS
 from brainpy.errors import MathError
 
@@ -542,6 +543,7 @@ class VarList(list):
     if not isinstance(element, Variable):
       raise TypeError(f'element must be an instance of {Variable.__name__}.')
     super().append(element)
+    bump_topology_version()
     return self
 
   def extend(self, iterable) -> 'VarList':
@@ -568,8 +570,51 @@ class VarList(list):
       self[key].value = value
     else:
       super().__setitem__(key, value)
+      bump_topology_version()
     return self
 
+  # The other list mutations change the collected variables (or their
+  # indices), so that the cached results of ``vars()`` must be dropped.
+
+  def __delitem__(self, key):
+    super().__delitem__(key)
+    bump_topology_version()
+
+  def __iadd__(self, other) -> 'VarList':
+    return self.extend(other)
+
+  def __imul__(self, n) -> 'VarList':
+    super().__imul__(n)
+    bump_topology_version()
+    return self
+
+  def insert(self, index, element):
+    if not isinstance(element, Variable):
+      raise TypeError(f'element must be an instance of {Variable.__name__}.')
+    super().insert(index, element)
+    bump_topology_version()
+
+  def pop(self, index=-1):
+    element = super().pop(index)
+    bump_topology_version()
+    return element
+
+  def remove(self, element):
+    super().remove(element)
+    bump_topology_version()
+
+  def clear(self):
+    super().clear()
+    bump_topology_version()
+
+  def reverse(self):
+    super().reverse()
+    bump_topology_version()
+
+  def sort(self, *args, **kwargs):
+    super().sort(*args, **kwargs)
+    bump_topology_version()
+
   def tree_flatten(self):
     return tuple(self), None
 
@@ -608,7 +653,7 @@ class VarDict(dict):
           self[k] = v
       elif isinstance(arg, tuple):
         assert len(arg) == 2
-        self[arg[0]] = args[1]
+        self[arg[0]] = arg[1]
     for k, v in kwargs.items():
       self[k] = v
     return self
@@ -631,8 +676,38 @@ class VarDict(dict):
       self[key].value = value
     else:
       super().__setitem__(key, self._check_elem(value))
+      bump_topology_version()
     return self
 
+  # The other dict mutations change the collected variables, so that
+  # the cached results of ``vars()`` must be dropped.
+
+  def __delitem__(self, key):
+    super().__delitem__(key)
+    bump_topology_version()
+
+  def __ior__(self, other) -> 'VarDict':
+    return self.update(other)
+
+  def setdefault(self, key, default=None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def pop(self, key, *args):
+    value = super().pop(key, *args)
+    bump_topology_version()
+    return value
+
+  def popitem(self):
+    item = super().popitem()
+    bump_topology_version()
+    return item
+
+  def clear(self):
+    super().clear()
+    bump_topology_version()
+
   def tree_flatten(self):
     return tuple(self.values()), tuple(self.keys())
 
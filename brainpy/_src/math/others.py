@@ -92,15 +92,10 @@ def clip_by_norm(t, clip_norm, axis=None):
 
 
 def _exprel(x, threshold):
-  def true_f(x):
-    x2 = x * x
-    return 1. + x / 2. + x2 / 6. + x2 * x / 24.0  # + x2 * x2 / 120.
-
-  def false_f(x):
-    return (jnp.exp(x) - 1) / x
-
-  # return jax.lax.cond(jnp.abs(x) < threshold, true_f, false_f, x)
-  return jnp.where(jnp.abs(x) <= threshold, 1. + x / 2. + x * x / 6., (jnp.exp(x) - 1) / x)
+  small = jnp.abs(x) <= threshold
+  # the unselected branch is also differentiated, so it must not be 0/0 at x = 0
+  safe_x = jnp.where(small, 1., x)
+  return jnp.where(small, 1. + x / 2. + x * x / 6., jnp.expm1(safe_x) / safe_x)
 
 
 def exprel(x, threshold: float = None):
@@ -279,6 +279,13 @@ def _binomial(key, p, n, shape):
   return jnp.reshape(ret, shape)
 
 
+@partial(jit, static_argnums=(2,))
+def _bernoulli_trials(key, p, shape):
+  # the same as ``_binomial(key, p, 1, shape)``, returning 0 for nan ``p``
+  shape = shape or jnp.shape(p)
+  return (jr.uniform(key, shape) < p).astype(jnp.asarray(1).dtype)
+
+
 @partial(jit, static_argnums=(2,))
 def _categorical(key, p, shape):
   # this implementation is fast when event shape is small, and slow otherwise
@@ -932,7 +939,11 @@ class RandomState(Variable):
     if size is None:
       size = jnp.broadcast_shapes(jnp.shape(n), jnp.shape(p))
     key = self.split_key() if key is None else _formalize_key(key)
-    r = _binomial(key, p, n, shape=_size2shape(size))
+    if isinstance(n, int) and n == 1:
+      # Bernoulli trials, which do not need the rejection sampling
+      r = _bernoulli_trials(key, p, shape=_size2shape(size))
+    else:
+      r = _binomial(key, p, n, shape=_size2shape(size))
     return _return(r)
 
   def chisquare(self, df, size: Optional[Union[int, Sequence[int]]] = None,
@@ -19,3 +19,8 @@ class Test_exprel(TestCase):
 
 
 
+
+  def test_grad_at_zero(self):
+    grad = bm.vector_grad(bm.exprel)(bm.asarray([0., 1e-6, 1e-3]))
+    self.assertTrue(bm.isfinite(grad).all())
+    self.assertTrue(bm.allclose(grad, 0.5, atol=1e-2))
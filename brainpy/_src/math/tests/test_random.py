@@ -297,7 +297,7 @@ class TestRandom(unittest.TestCase):
     print(a)
     print(b)
     self.assertTupleEqual(a.shape, ())
-    self.assertTrue(a.dtype, int)
+    self.assertTrue(jnp.issubdtype(a.dtype, jnp.integer))
 
   def test_binomial2(self):
     br.seed()
@@ -310,6 +310,14 @@ class TestRandom(unittest.TestCase):
     a = bm.random.binomial(n=bm.asarray([2, 3, 4]), p=bm.asarray([[0.5, 0.5, 0.5], [0.6, 0.6, 0.6]]))
     self.assertTupleEqual(a.shape, (2, 3))
 
+  def test_binomial4(self):
+    br.seed()
+    a = bm.random.binomial(1, bm.asarray([0., 0.5, 1.]), size=(1000, 3))
+    self.assertTupleEqual(a.shape, (1000, 3))
+    self.assertTrue(jnp.issubdtype(a.dtype, jnp.integer))
+    self.assertTrue((a[:, 0] == 0).all() and (a[:, 2] == 1).all())
+    self.assertTrue(0.4 < a[:, 1].mean() < 0.6)
+
   def test_chisquare1(self):
     br.seed()
     a = bm.random.chisquare(3)
@@ -252,10 +252,7 @@ class TreeNode(MixIn):
   master_type: type
 
   def check_hierarchies(self, root, *leaves, **named_leaves):
-    global DynamicalSystem
-    if DynamicalSystem is None:
-      from brainpy._src.dynsys import DynamicalSystem
-
+    DynamicalSystem = _get_dynsys()
     for leaf in leaves:
       if isinstance(leaf, DynamicalSystem):
         self.check_hierarchy(root, leaf)
@@ -49,7 +49,7 @@ class DotDict(dict):
     self.__dict__ = self
 
   def copy(self) -> 'DotDict':
-    return type(self)(super().copy())
+    return type(self)(self)
 
   def to_numpy(self):
     """Change all values to numpy arrays."""
@@ -96,7 +96,7 @@ class DotDict(dict):
     if isinstance(other, dict):
       for key, val in other.items():
         if key in gather:
-          if id(val) != id(gather[key]):
+          if val is not gather[key]:
             raise ValueError(f'Cannot remove {key}, because we got two different values: '
                              f'{val} != {gather[key]}')
           gather.pop(key)
@@ -153,11 +153,7 @@ class DotDict(dict):
     var_type : type
       The type/class to match.
     """
-    gather = type(self)()
-    for key, value in self.items():
-      if isinstance(value, var_type):
-        gather[key] = value
-    return gather
+    return type(self)((k, v) for k, v in self.items() if isinstance(v, var_type))
 
   def unique(self):
     """Get a new type of collector with unique values.
@@ -165,13 +161,10 @@ class DotDict(dict):
     If one value is assigned to two or more keys,
     then only one pair of (key, value) will be returned.
     """
-    gather = type(self)()
-    seen = set()
+    gather = dict()
     for k, v in self.items():
-      if id(v) not in seen:
-        seen.add(id(v))
-        gather[k] = v
-    return gather
+      gather.setdefault(id(v), (k, v))
+    return type(self)(gather.values())
 
   def __hash__(self):
     return hash(tuple(sorted(self.items())))
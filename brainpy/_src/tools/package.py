@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+
 import numpy as np
 
 try:
@@ -27,14 +29,21 @@ def numba_jit(f=None, **kwargs):
     if numba is None:
       return f
     else:
-      return numba.njit(f)
+      return numba.njit(f, **kwargs)
 
 
-@numba_jit
 def _seed(seed):
   np.random.seed(seed)
 
 
+if SUPPORT_NUMBA:
+  if os.environ.get('BRAINPY_AOT', '0') == '1':
+    # compile eagerly at import, so that the first call does not pay the compilation
+    _seed = numba.njit('void(int64)', cache=True)(_seed)
+  else:
+    _seed = numba.njit(cache=True)(_seed)
+
+
 def numba_seed(seed):
   if numba is not None and seed is not None:
     _seed(seed)
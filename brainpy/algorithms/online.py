@@ -111,7 +111,7 @@ class RLS(OnlineAlgorithm):
       identifier: str = '',
   ):
     identifier = identifier + self.postfix
-    self.implicit_vars[identifier] = bm.Variable(jnp.eye(feature_in) * self.alpha)
+    self.register_implicit_vars({identifier: bm.Variable(jnp.eye(feature_in) * self.alpha)})
 
   def call(
       self,